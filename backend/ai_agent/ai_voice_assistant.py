@@ -1,32 +1,36 @@
+import base64
+
 import speech_recognition as sr
-import pyttsx3
 
-from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.prompts import PromptTemplate
-from langchain_ollama import OllamaLLM
+
+from ai_agent.tts_worker import TTSWorker
+from common.conversation_memory import SessionMemoryStore
+from common.llm_gateway import BACKGROUND, get_llm
+from common.streaming import answer_events
 
 # =====================================================
 # MODEL SETUP (UNCHANGED)
 # =====================================================
 
-llm = OllamaLLM(model="mistral")  # or llama3
+llm = get_llm("mistral")  # or llama3; shared, rate-limited Ollama gateway
 
 # =====================================================
 # MEMORY (REPLACES st.session_state)
 # =====================================================
 
-chat_history = ChatMessageHistory()
+# Per-user windowed history; older turns are summarized in the background
+memory_store = SessionMemoryStore(get_llm("mistral", priority=BACKGROUND))
 
 # =====================================================
-# TEXT TO SPEECH (UNCHANGED)
+# TEXT TO SPEECH
 # =====================================================
 
-engine = pyttsx3.init()
-engine.setProperty("rate", 160)
+# Owns the pyttsx3 engine on its own thread; speak() no longer blocks
+tts_worker = TTSWorker(rate=160)
 
 def speak(text: str):
-    engine.say(text)
-    engine.runAndWait()
+    return tts_worker.speak(text)
 
 # =====================================================
 # SPEECH RECOGNITION (UNCHANGED)
@@ -60,13 +64,11 @@ prompt = PromptTemplate(
 # CORE AI LOGIC (UNCHANGED)
 # =====================================================
 
-def run_chain(question: str) -> str:
-    chat_history_text = "\n".join(
-        [f"{msg.type.capitalize()}: {msg.content}" for msg in chat_history.messages]
-    )
+def run_chain(question: str, session_id: str = None) -> str:
+    chat_history = memory_store.get(session_id)
 
     response = llm.invoke(
-        prompt.format(chat_history=chat_history_text, question=question)
+        prompt.format(chat_history=chat_history.render(), question=question)
     )
 
     chat_history.add_user_message(question)
@@ -74,21 +76,50 @@ def run_chain(question: str) -> str:
 
     return response
 
+
+def stream_chain(question: str, session_id: str = None):
+    """
+    Streaming run_chain: yields (event, data) pairs and records the
+    exchange in the session's memory once the full answer has been generated.
+    """
+    chat_history = memory_store.get(session_id)
+
+    def complete(response: str):
+        chat_history.add_user_message(question)
+        chat_history.add_ai_message(response)
+
+    return answer_events(
+        llm,
+        prompt.format(chat_history=chat_history.render(), question=question),
+        {"history_messages": len(chat_history)},
+        on_complete=complete,
+    )
+
 # =====================================================
 # PUBLIC API FUNCTIONS (FOR FLASK / FRONTEND)
 # =====================================================
 
-def voice_assistant_text_api(user_text: str) -> str:
+def voice_assistant_text_api(user_text: str, session_id: str = None) -> str:
     """
     Call this when text is sent from frontend
     """
     if not user_text or not user_text.strip():
         return "I didn't hear anything. Please try again."
 
-    response = run_chain(user_text)
+    response = run_chain(user_text, session_id)
     return response
 
 
+def voice_assistant_stream_api(user_text: str, session_id: str = None):
+    """
+    Call this for streamed (SSE) text replies
+    """
+    if not user_text or not user_text.strip():
+        return answer_events(llm, None, {}, answer="I didn't hear anything. Please try again.")
+
+    return stream_chain(user_text, session_id)
+
+
 def voice_assistant_voice_api() -> str:
     """
     Optional: Call this if you want mic-based interaction on server
@@ -97,7 +128,49 @@ def voice_assistant_voice_api() -> str:
     if not user_query:
         return "Sorry, I could not understand you."
 
-    response = run_chain(user_query)
-    speak(response)
+    # Speak sentence by sentence while the rest of the reply is generated
+    job = tts_worker.start_job(play=True)
+    tokens = []
+    for event, data in stream_chain(user_query):
+        if event == "token":
+            tokens.append(data)
+            job.feed(data)
+    job.finish()
 
-    return response
+    return "".join(tokens)
+
+
+def with_audio(events):
+    """
+    Pass (event, data) pairs through, adding an "audio" event with a
+    base64 WAV for each sentence as soon as it has been synthesized.
+    """
+    job = tts_worker.start_job(play=False)
+
+    def audio_event(chunk):
+        index, sentence, audio = chunk
+        return "audio", {
+            "index": index,
+            "text": sentence,
+            "wav_base64": base64.b64encode(audio).decode("ascii") if audio else None,
+        }
+
+    for event, data in events:
+        if event == "token":
+            job.feed(data)
+        elif event == "done":
+            job.finish()
+            for chunk in job.chunks():
+                yield audio_event(chunk)
+            first_audio = job.first_audio_s
+            data = dict(data, first_audio_ms=round(first_audio * 1000, 1) if first_audio is not None else None)
+        yield event, data
+        for chunk in job.ready():
+            yield audio_event(chunk)
+
+
+def voice_assistant_audio_stream_api(user_text: str, session_id: str = None):
+    """
+    Call this for streamed (SSE) replies with spoken audio per sentence
+    """
+    return with_audio(voice_assistant_stream_api(user_text, session_id))
@@ -0,0 +1,257 @@
+import logging
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pyttsx3
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+TTS_RATE = 160
+MIN_SENTENCE_CHARS = 20      # merge "Hi." / "Dr." style fragments into the next sentence
+MAX_SENTENCE_CHARS = 240     # split run-on text so first audio isn't held back
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+
+# =====================================================
+# SENTENCE SPLITTING
+# =====================================================
+
+class SentenceBuffer:
+    """
+    Accumulates streamed text and hands back complete sentences.
+    """
+
+    def __init__(self):
+        self._buf = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buf += text
+        sentences = []
+        while True:
+            cut = next(
+                (m for m in _SENTENCE_END.finditer(self._buf) if m.start() >= MIN_SENTENCE_CHARS),
+                None,
+            )
+            if cut is not None:
+                sentences.append(self._buf[:cut.start()].strip())
+                self._buf = self._buf[cut.end():]
+            elif len(self._buf) > MAX_SENTENCE_CHARS:
+                pos = self._buf.rfind(" ", 0, MAX_SENTENCE_CHARS)
+                pos = pos if pos > 0 else MAX_SENTENCE_CHARS
+                sentences.append(self._buf[:pos].strip())
+                self._buf = self._buf[pos:].lstrip()
+            else:
+                return sentences
+
+    def flush(self) -> List[str]:
+        rest, self._buf = self._buf.strip(), ""
+        return [rest] if rest else []
+
+
+# =====================================================
+# JOBS
+# =====================================================
+
+_END = object()
+
+
+class TTSJob:
+    """
+    One utterance. Text goes in through feed()/finish() (whole replies
+    or streamed LLM tokens); synthesized sentences come out of chunks()
+    in order as (index, sentence, wav_bytes). wav_bytes is None in play
+    mode, where the worker speaks the sentence on the server instead.
+    """
+
+    def __init__(self, worker: "TTSWorker", play: bool):
+        self.worker = worker
+        self.play = play
+        self.created = time.perf_counter()
+        self.first_audio_s: Optional[float] = None
+        self._buffer = SentenceBuffer()
+        self._chunks: "queue.Queue" = queue.Queue()
+        self._next_index = 0
+
+    def feed(self, text: str):
+        for sentence in self._buffer.feed(text):
+            self._submit(sentence)
+
+    def finish(self):
+        for sentence in self._buffer.flush():
+            self._submit(sentence)
+        self.worker.submit(self, None, None)
+
+    def _submit(self, sentence: str):
+        if sentence:
+            self.worker.submit(self, self._next_index, sentence)
+            self._next_index += 1
+
+    def _mark_first_audio(self):
+        if self.first_audio_s is None:
+            self.first_audio_s = time.perf_counter() - self.created
+            self.worker.record_first_audio(self.first_audio_s)
+
+    def _deliver(self, item):
+        self._chunks.put(item)
+
+    def chunks(self, timeout: Optional[float] = None) -> Iterator[Tuple[int, str, Optional[bytes]]]:
+        while True:
+            item = self._chunks.get(timeout=timeout)
+            if item is _END:
+                return
+            yield item
+
+    def ready(self) -> List[Tuple[int, str, Optional[bytes]]]:
+        """
+        Sentences finished so far, without blocking. Call chunks() after
+        finish() for the rest.
+        """
+        items = []
+        while True:
+            try:
+                item = self._chunks.get_nowait()
+            except queue.Empty:
+                return items
+            if item is _END:
+                self._chunks.put(_END)
+                return items
+            items.append(item)
+
+    def wait(self, timeout: Optional[float] = None) -> List[Tuple[int, str, Optional[bytes]]]:
+        return list(self.chunks(timeout))
+
+
+# =====================================================
+# WORKER
+# =====================================================
+
+class TTSWorker:
+    """
+    Owns the pyttsx3 engine on one dedicated thread (pyttsx3 drivers are
+    not thread-safe) and synthesizes queued sentences one at a time.
+    Sentences from concurrent jobs interleave, so a long reply doesn't
+    hold up everyone else's first sentence.
+    """
+
+    def __init__(self, rate: int = TTS_RATE):
+        self.rate = rate
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.jobs = 0
+        self.sentences = 0
+        self.failures = 0
+        self.synth_s = 0.0
+        self.first_audio_total_s = 0.0
+        self.first_audio_count = 0
+
+    def start_job(self, play: bool = False) -> TTSJob:
+        self._ensure_thread()
+        with self._lock:
+            self.jobs += 1
+        return TTSJob(self, play)
+
+    def speak(self, text: str, play: bool = True) -> TTSJob:
+        job = self.start_job(play)
+        job.feed(text)
+        job.finish()
+        return job
+
+    def speak_tokens(self, tokens: Iterable[str], play: bool = True) -> TTSJob:
+        """
+        Feed an LLM token stream; synthesis of each sentence starts as
+        soon as it is complete, while later tokens are still arriving.
+        """
+        job = self.start_job(play)
+        for token in tokens:
+            job.feed(token)
+        job.finish()
+        return job
+
+    def submit(self, job: TTSJob, index: Optional[int], sentence: Optional[str]):
+        self._queue.put((job, index, sentence))
+
+    def record_first_audio(self, seconds: float):
+        with self._lock:
+            self.first_audio_total_s += seconds
+            self.first_audio_count += 1
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            engine = pyttsx3.init()
+            engine.setProperty("rate", self.rate)
+        except Exception as e:
+            logger.warning("TTS engine unavailable: %s", e)
+            engine = None
+
+        while True:
+            job, index, sentence = self._queue.get()
+            if sentence is None:
+                job._deliver(_END)
+                continue
+
+            start = time.perf_counter()
+            audio = None
+            try:
+                if engine is None:
+                    raise RuntimeError("TTS engine unavailable")
+                if job.play:
+                    engine.say(sentence)
+                    job._mark_first_audio()
+                    engine.runAndWait()
+                else:
+                    audio = self._synthesize(engine, sentence)
+                    job._mark_first_audio()
+            except Exception as e:
+                logger.warning("TTS failed for sentence %s: %s", index, e)
+                with self._lock:
+                    self.failures += 1
+
+            with self._lock:
+                self.sentences += 1
+                self.synth_s += time.perf_counter() - start
+            job._deliver((index, sentence, audio))
+
+    @staticmethod
+    def _synthesize(engine, sentence: str) -> bytes:
+        # pyttsx3 can only render to a file; read it straight back into memory
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            engine.save_to_file(sentence, path)
+            engine.runAndWait()
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "jobs": self.jobs,
+                "sentences": self.sentences,
+                "failures": self.failures,
+                "queue_depth": self._queue.qsize(),
+                "avg_sentence_ms": round(self.synth_s / self.sentences * 1000, 1) if self.sentences else 0.0,
+                "avg_first_audio_ms": (
+                    round(self.first_audio_total_s / self.first_audio_count * 1000, 1)
+                    if self.first_audio_count else 0.0
+                ),
+            }
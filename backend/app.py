@@ -1,237 +1,425 @@
 from flask import (
-    Flask, request, jsonify,
+    Flask, request, jsonify, Response, stream_with_context,
     session, redirect, render_template, url_for
 )
 from flask_cors import CORS
 from functools import wraps
 import os, tempfile
 
-# =========================
-# IMPORT AI MODULES
-# =========================
-from code_analyzer.ai_based_code_analyzer import analyze_code_api as run_code_analysis
-from ai_agent.ai_voice_assistant import voice_assistant_text_api
-from q_and_a_bot.ai_document_reader import upload_pdf_and_process, ask_question
-from video_analyzer.ai_based_video_analyzer import analyze_video
-from webscrapper.ai_web_scrapper_faiss import scrape_and_store, ask_web_question
-
-# =========================
-# APP SETUP
-# =========================
-app = Flask(__name__)
-app.secret_key = "studybuddy_secret_key"
-CORS(app, supports_credentials=True)
-
 UPLOAD_FOLDER = tempfile.gettempdir()
 users = {}  # demo user store
 
-# =========================
-# AUTH DECORATOR
-# =========================
-def login_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        if "user" not in session:
-            return redirect(url_for("login_page"))
-        return f(*args, **kwargs)
-    return decorated
+VIDEO_PIPELINE_PARAMS = {
+    "whisper_model_name": "base",
+    "blip_model_name": "Salesforce/blip-image-captioning-base",
+    "sample_fps": 0.5,
+    "max_captions": 100,
+}
 
 # =========================
-# PAGE ROUTES
+# APP FACTORY
 # =========================
-@app.route("/")
-def root():
-    return redirect(url_for("login_page"))
-
-@app.route("/login", methods=["GET"])
-def login_page():
-    return render_template("login.html")
-
-@app.route("/dashboard")
-@login_required
-def dashboard():
-    return render_template("index.html")
-
-@app.route("/logout")
-def logout():
-    session.clear()
-    return redirect(url_for("login_page"))
-
-# =========================
-# TOOL PAGES
-# =========================
-@app.route("/web")
-@login_required
-def web_page():
-    return render_template("tools/web.html")
-
-@app.route("/video")
-@login_required
-def video_page():
-    return render_template("tools/video.html")
-
-
-@app.route("/code")
-@login_required
-def code_page():
-    return render_template("tools/code.html")
-
-@app.route("/pdf")
-@login_required
-def pdf_page():
-    return render_template("pdf.html")
-
-@app.route("/voice")
-@login_required
-def voice_page():
-    return render_template("tools/voice.html")
-
-
-# =========================
-# AUTH APIs
-# =========================
-@app.route("/api/register", methods=["POST"])
-def register_api():
-    data = request.json
-    users[data["username"]] = data["password"]
-    return jsonify({"message": "Registered"})
-
-@app.route("/api/login", methods=["POST"])
-def login_api():
-    data = request.json
-    if users.get(data["username"]) != data["password"]:
-        return jsonify({"error": "Invalid credentials"}), 401
-    session["user"] = data["username"]
-    return jsonify({"message": "Login success"})
-
-# =========================
-# AI APIs
-# =========================
-@app.route("/analyze-code", methods=["POST"])
-@login_required
-def analyze_code_route():
-    data = request.json
-
-    code = data.get("code", "")
-    language = data.get("language", "python")
-
-    if not code.strip():
-        return jsonify({"error": "Empty code"}), 400
-
-    try:
-        result = run_code_analysis(code, language)
+def create_app():
+    """
+    The AI modules load models and open the FAISS indexes and SQLite
+    stores when imported, so they are imported here and not at module
+    level: spawn-context worker pools re-import this file (as
+    __mp_main__) in every worker, and must get only the definitions.
+    """
+    # =========================
+    # IMPORT AI MODULES
+    # =========================
+    from code_analyzer.ai_based_code_analyzer import analyze_code_api as run_code_analysis
+    from code_analyzer.ai_based_code_analyzer import analyze_code_incremental as run_incremental_analysis
+    from code_analyzer.incremental import code_sessions
+    from code_analyzer.python_rules import python_engine
+    from ai_agent.ai_voice_assistant import (
+        voice_assistant_text_api, voice_assistant_stream_api, voice_assistant_audio_stream_api,
+        memory_store as voice_memory, tts_worker,
+    )
+    from q_and_a_bot.ai_document_reader import (
+        upload_pdf_and_process, ask_question, ask_question_stream, is_document_indexed, get_ingest_progress,
+        PIPELINE_PARAMS as PDF_PIPELINE_PARAMS, store as pdf_store,
+    )
+    from video_analyzer.ai_based_video_analyzer import analyze_video, summarize_video, video_memory
+    from webscrapper.ai_web_scrapper_faiss import (
+        scrape_and_store, ask_web_question, ask_web_question_stream, vector_store as web_store,
+    )
+    from common.model_pool import model_pool
+    from common.embedding_service import get_embeddings
+    from common.embedding_cache import embedding_cache
+    from common.query_cache import answer_cache, query_embedding_cache
+    from common.semantic_cache import semantic_cache
+    from common.context_packing import packing_stats
+    from common.llm_gateway import LLMBusyError, llm_gateway
+    from common.streaming import sse_event, streaming_stats
+    from common.result_cache import result_cache, save_and_hash, make_key
+
+    # Crash recovery for the indexes; only this (serving) process runs it
+    pdf_store.recover()
+    web_store.recover()
+
+    # =========================
+    # APP SETUP
+    # =========================
+    app = Flask(__name__)
+    app.secret_key = "studybuddy_secret_key"
+    CORS(app, supports_credentials=True)
+
+    # =========================
+    # ERROR HANDLERS
+    # =========================
+    @app.errorhandler(LLMBusyError)
+    def llm_busy(e):
+        response = jsonify({"error": str(e)})
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+        return response
+
+    # =========================
+    # STREAMING HELPERS
+    # =========================
+    def sse_response(events):
+        """
+        Wrap an (event, data) generator as a text/event-stream response.
+        Errors mid-stream are sent as an "error" event since the status
+        line has already gone out.
+        """
+        def generate():
+            try:
+                for event, data in events:
+                    yield sse_event(event, data)
+            except Exception as e:
+                print("❌ Streaming Error:", e)
+                yield sse_event("error", {"error": str(e)})
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    # =========================
+    # UPLOAD HELPERS
+    # =========================
+    def process_pdf_upload(file):
+        path = os.path.join(UPLOAD_FOLDER, file.filename)
+        file_hash = save_and_hash(file.stream, path)
+
+        # Only reuse the cached result if the document's chunks are still indexed
+        key = make_key(file_hash, PDF_PIPELINE_PARAMS)
+        if is_document_indexed(file_hash):
+            result = result_cache.get(key)
+            if result is not None:
+                return result
+
+        result = upload_pdf_and_process(path, doc_id=file_hash)
+        if result.get("status") == "success":
+            result_cache.put(key, result)
+        return result
+
+    # =========================
+    # AUTH DECORATOR
+    # =========================
+    def login_required(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if "user" not in session:
+                return redirect(url_for("login_page"))
+            return f(*args, **kwargs)
+        return decorated
+
+    # =========================
+    # PAGE ROUTES
+    # =========================
+    @app.route("/")
+    def root():
+        return redirect(url_for("login_page"))
+
+    @app.route("/login", methods=["GET"])
+    def login_page():
+        return render_template("login.html")
+
+    @app.route("/dashboard")
+    @login_required
+    def dashboard():
+        return render_template("index.html")
+
+    @app.route("/logout")
+    def logout():
+        session.clear()
+        return redirect(url_for("login_page"))
+
+    # =========================
+    # TOOL PAGES
+    # =========================
+    @app.route("/web")
+    @login_required
+    def web_page():
+        return render_template("tools/web.html")
+
+    @app.route("/video")
+    @login_required
+    def video_page():
+        return render_template("tools/video.html")
+
+
+    @app.route("/code")
+    @login_required
+    def code_page():
+        return render_template("tools/code.html")
+
+    @app.route("/pdf")
+    @login_required
+    def pdf_page():
+        return render_template("pdf.html")
+
+    @app.route("/voice")
+    @login_required
+    def voice_page():
+        return render_template("tools/voice.html")
+
+
+    # =========================
+    # AUTH APIs
+    # =========================
+    @app.route("/api/register", methods=["POST"])
+    def register_api():
+        data = request.json
+        users[data["username"]] = data["password"]
+        return jsonify({"message": "Registered"})
+
+    @app.route("/api/login", methods=["POST"])
+    def login_api():
+        data = request.json
+        if users.get(data["username"]) != data["password"]:
+            return jsonify({"error": "Invalid credentials"}), 401
+        session["user"] = data["username"]
+        return jsonify({"message": "Login success"})
+
+    # =========================
+    # AI APIs
+    # =========================
+    @app.route("/analyze-code", methods=["POST"])
+    @login_required
+    def analyze_code_route():
+        data = request.json
+
+        code = data.get("code", "")
+        language = data.get("language", "python")
+
+        if not code.strip():
+            return jsonify({"error": "Empty code"}), 400
+
+        try:
+            result = run_code_analysis(code, language)
+            return jsonify(result)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/analyze-code/incremental", methods=["POST"])
+    @login_required
+    def analyze_code_incremental_route():
+        """
+        {"doc_id", "language", "code"} opens/resets a buffer;
+        {"doc_id", "language", "edits": [{"start", "end", "text"}]} updates it.
+        409 with "resync" means the client must send the full code again.
+        """
+        data = request.json or {}
+        language = data.get("language", "python")
+        key = (session.get("user"), data.get("doc_id", "default"))
+
+        try:
+            result = run_incremental_analysis(key, language, data.get("code"), data.get("edits"))
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+        if result.get("resync"):
+            return jsonify(result), 409
         return jsonify(result)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
 
 
 
-
-@app.route("/voice/ask", methods=["POST"])
-@login_required
-def voice_ask_api():
-    data = request.json or {}
-    query = data.get("text", "").strip()
-
-    if not query:
-        return jsonify({"error": "Empty input"}), 400
-
-    try:
-        response = voice_assistant_text_api(query)
+    @app.route("/voice/ask", methods=["POST"])
+    @login_required
+    def voice_ask_api():
+        data = request.json or {}
+        query = data.get("text", "").strip()
+
+        if not query:
+            return jsonify({"error": "Empty input"}), 400
+
+        try:
+            response = voice_assistant_text_api(query, session.get("user"))
+            return jsonify({"response": response})
+        except LLMBusyError:
+            # answered by the 503 + Retry-After handler
+            raise
+        except Exception as e:
+            print("❌ Voice Assistant Error:", e)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/pdf/upload", methods=["POST"])
+    @login_required
+    def pdf_upload():
+        if "file" not in request.files:
+            return jsonify({"error": "No file uploaded"}), 400
+
+        file = request.files["file"]
+
+        if not file.filename.endswith(".pdf"):
+            return jsonify({"error": "Only PDF files allowed"}), 400
+
+        return jsonify(process_pdf_upload(file))
+
+    @app.route("/pdf/progress", methods=["GET"])
+    @login_required
+    def pdf_progress():
+        return jsonify(get_ingest_progress())
+
+    @app.route("/pdf/ask", methods=["POST"])
+    @login_required
+    def pdf_ask():
+        question = request.json.get("question")
+        if not question:
+            return jsonify({"error": "No question provided"}), 400
+
+        answer = ask_question(question)
+        return jsonify({"answer": answer})
+
+    @app.route("/pdf/ask/stream", methods=["POST"])
+    @login_required
+    def pdf_ask_stream():
+        question = request.json.get("question")
+        if not question:
+            return jsonify({"error": "No question provided"}), 400
+
+        return sse_response(ask_question_stream(question))
+    @app.route("/document/upload", methods=["POST"])
+    @login_required
+    def document_upload_api():
+        if "file" not in request.files:
+            return jsonify({"error": "No file uploaded"}), 400
+
+        file = request.files["file"]
+
+        if not file.filename.endswith(".pdf"):
+            return jsonify({"error": "Only PDF files allowed"}), 400
+
+        return jsonify(process_pdf_upload(file))
+
+
+    @app.route("/document/ask", methods=["POST"])
+    @login_required
+    def document_ask_api():
+        data = request.json
+        question = data.get("question")
+        return jsonify({"answer": ask_question(question)})
+
+    @app.route("/document/ask/stream", methods=["POST"])
+    @login_required
+    def document_ask_stream_api():
+        data = request.json
+        question = data.get("question")
+        return sse_response(ask_question_stream(question))
+
+    @app.route("/video/upload", methods=["POST"])
+    @login_required
+    def video_upload_api():
+        if "file" not in request.files:
+            return jsonify({"error": "No video uploaded"}), 400
+
+        file = request.files["file"]
+        path = os.path.join(UPLOAD_FOLDER, file.filename)
+        file_hash = save_and_hash(file.stream, path)
+
+        # Only the session-independent analysis is cached here; the summary
+        # depends on this user's conversation memory, and summarize_video
+        # reuses it only while that memory is unchanged
+        key = make_key(file_hash, dict(VIDEO_PIPELINE_PARAMS, pipeline="video"))
+        result = result_cache.get(key)
+        if result is None:
+            result = analyze_video(path, summarize=False, **VIDEO_PIPELINE_PARAMS)
+            result_cache.put(key, result)
+        return jsonify(summarize_video(result, session_id=session.get("user")))
+
+    @app.route("/web/scrape", methods=["POST"])
+    @login_required
+    def web_scrape_api():
+        url = request.json.get("url")
+        return jsonify(scrape_and_store(url))
+
+    @app.route("/web/ask", methods=["POST"])
+    @login_required
+    def web_ask_api():
+        question = request.json.get("question")
+        return jsonify({"answer": ask_web_question(question)})
+
+    @app.route("/web/ask/stream", methods=["POST"])
+    @login_required
+    def web_ask_stream_api():
+        question = request.json.get("question")
+        return sse_response(ask_web_question_stream(question))
+
+    @app.route("/api/web/ask", methods=["POST"])
+    @login_required
+    def web_ask():
+        return jsonify({"answer": ask_web_question(request.json["question"])})
+
+    @app.route("/api/web/ask/stream", methods=["POST"])
+    @login_required
+    def web_ask_stream():
+        return sse_response(ask_web_question_stream(request.json["question"]))
+    @app.route("/voice/ask", methods=["POST"])
+    @login_required
+    def voice_assistant_api():
+        text = request.json.get("text")
+        response = voice_assistant_text_api(text, session.get("user"))
         return jsonify({"response": response})
-    except Exception as e:
-        print("❌ Voice Assistant Error:", e)
-        return jsonify({"error": str(e)}), 500
-
-@app.route("/pdf/upload", methods=["POST"])
-@login_required
-def pdf_upload():
-    if "file" not in request.files:
-        return jsonify({"error": "No file uploaded"}), 400
-
-    file = request.files["file"]
-
-    if not file.filename.endswith(".pdf"):
-        return jsonify({"error": "Only PDF files allowed"}), 400
-
-    path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(path)
-
-    result = upload_pdf_and_process(path)
-    return jsonify(result)
-
-@app.route("/pdf/ask", methods=["POST"])
-@login_required
-def pdf_ask():
-    question = request.json.get("question")
-    if not question:
-        return jsonify({"error": "No question provided"}), 400
-
-    answer = ask_question(question)
-    return jsonify({"answer": answer})
-@app.route("/document/upload", methods=["POST"])
-@login_required
-def document_upload_api():
-    if "file" not in request.files:
-        return jsonify({"error": "No file uploaded"}), 400
-
-    file = request.files["file"]
-
-    if not file.filename.endswith(".pdf"):
-        return jsonify({"error": "Only PDF files allowed"}), 400
-
-    path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(path)
-
-    result = upload_pdf_and_process(path)
-    return jsonify(result)
-
-
-@app.route("/document/ask", methods=["POST"])
-@login_required
-def document_ask_api():
-    data = request.json
-    question = data.get("question")
-    return jsonify({"answer": ask_question(question)})
-
-@app.route("/video/upload", methods=["POST"])
-@login_required
-def video_upload_api():
-    if "file" not in request.files:
-        return jsonify({"error": "No video uploaded"}), 400
-
-    file = request.files["file"]
-    path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(path)
-
-    result = analyze_video(path)
-    return jsonify(result)
-
-@app.route("/web/scrape", methods=["POST"])
-@login_required
-def web_scrape_api():
-    url = request.json.get("url")
-    return jsonify(scrape_and_store(url))
-
-@app.route("/web/ask", methods=["POST"])
-@login_required
-def web_ask_api():
-    question = request.json.get("question")
-    return jsonify({"answer": ask_web_question(question)})
-
-@app.route("/api/web/ask", methods=["POST"])
-@login_required
-def web_ask():
-    return jsonify({"answer": ask_web_question(request.json["question"])})
-@app.route("/voice/ask", methods=["POST"])
-@login_required
-def voice_assistant_api():
-    text = request.json.get("text")
-    response = voice_assistant_text_api(text)
-    return jsonify({"response": response})
+
+    @app.route("/voice/ask/stream", methods=["POST"])
+    @login_required
+    def voice_ask_stream_api():
+        data = request.json or {}
+        return sse_response(voice_assistant_stream_api(data.get("text", ""), session.get("user")))
+
+    @app.route("/voice/ask/audio", methods=["POST"])
+    @login_required
+    def voice_ask_audio_api():
+        data = request.json or {}
+        return sse_response(voice_assistant_audio_stream_api(data.get("text", ""), session.get("user")))
+
+    # =========================
+    # METRICS
+    # =========================
+    @app.route("/api/metrics", methods=["GET"])
+    @login_required
+    def metrics_api():
+        return jsonify({
+            "models": model_pool.stats(),
+            "llm_gateway": llm_gateway.stats(),
+            "result_cache": result_cache.stats(),
+            "indexes": {"pdf": pdf_store.stats(), "web": web_store.stats()},
+            "embeddings": get_embeddings().stats(),
+            "embedding_cache": embedding_cache.stats(),
+            "query_embedding_cache": query_embedding_cache.stats(),
+            "answer_cache": answer_cache.stats(),
+            "semantic_cache": semantic_cache.stats(),
+            "context_packing": packing_stats(),
+            "streaming": streaming_stats(),
+            "tts": tts_worker.stats(),
+            "code_rules": {"python": python_engine.stats()},
+            "code_sessions": code_sessions.stats(),
+            "conversation_memory": {
+                "voice": voice_memory.stats(),
+                "video": video_memory.stats() if video_memory else None,
+            },
+        })
+
+    return app
 
 # =========================
 # RUN
 # =========================
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
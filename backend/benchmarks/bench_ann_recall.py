@@ -0,0 +1,84 @@
+"""
+Recall@k and query latency of IVF / HNSW settings against the exact
+IndexFlatL2 baseline.
+
+Run from backend/:
+    python -m benchmarks.bench_ann_recall [num_vectors] [index_name]
+
+With index_name (e.g. "pdf" or "web") the vectors of that persisted
+index are used; otherwise clustered synthetic 384-dim vectors.
+"""
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from common import index_manager
+from common.vector_index import INDEX_DIR, read_index_mmap
+
+DIM = 384
+K = 5
+NUM_QUERIES = 200
+NPROBES = [1, 4, 8, 16, 32, 64]
+EF_SEARCHES = [16, 32, 64, 128, 256]
+
+
+def synthetic_vectors(n: int, clusters: int = 256) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(clusters, DIM)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return centers[labels] + 0.3 * rng.normal(size=(n, DIM)).astype(np.float32)
+
+
+def load_vectors(name: str, n: int) -> np.ndarray:
+    index, _ = read_index_mmap(f"{INDEX_DIR}/{name}/index.faiss")
+    return index_manager.read_vectors(index, 0, min(n, index.ntotal))
+
+
+def timed_search(index, queries):
+    start = time.perf_counter()
+    _, I = index.search(queries, K)
+    return I, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall(found, truth) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    vectors = load_vectors(sys.argv[2], n) if len(sys.argv) > 2 else synthetic_vectors(n)
+    n = len(vectors)
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(n, NUM_QUERIES, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+    flat = index_manager.build_index("flat", vectors, DIM)
+    truth, flat_ms = timed_search(flat, queries)
+
+    print(f"{n} vectors, {NUM_QUERIES} queries, recall@{K}")
+    print(f"{'index':<8} {'param':<14} {'recall':>7} {'ms/query':>9}")
+    print(f"{'flat':<8} {'-':<14} {1.0:>7.3f} {flat_ms:>9.3f}")
+
+    start = time.perf_counter()
+    ivf = index_manager.build_index("ivf", vectors, DIM)
+    print(f"# ivf nlist={faiss.extract_index_ivf(ivf).nlist} built in {time.perf_counter() - start:.1f}s")
+    for nprobe in NPROBES:
+        index_manager.apply_search_params(ivf, nprobe=nprobe)
+        found, ms = timed_search(ivf, queries)
+        print(f"{'ivf':<8} {f'nprobe={nprobe}':<14} {recall(found, truth):>7.3f} {ms:>9.3f}")
+
+    start = time.perf_counter()
+    hnsw = index_manager.build_index("hnsw", vectors, DIM)
+    print(f"# hnsw M={index_manager.HNSW_M} built in {time.perf_counter() - start:.1f}s")
+    for ef in EF_SEARCHES:
+        index_manager.apply_search_params(hnsw, ef_search=ef)
+        found, ms = timed_search(hnsw, queries)
+        print(f"{'hnsw':<8} {f'efSearch={ef}':<14} {recall(found, truth):>7.3f} {ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Frames/sec of BLIP captioning for different batch sizes on CPU.
+
+Run from backend/:
+    python -m benchmarks.bench_caption_batching [video_path]
+"""
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from video_analyzer.ai_based_video_analyzer import (
+    caption_frames,
+    iter_frames_opencv,
+    load_blip_model,
+)
+
+BLIP_MODEL = "Salesforce/blip-image-captioning-base"
+BATCH_SIZES = [1, 4, 8, 16]
+NUM_FRAMES = 32
+
+
+def load_frames(video_path=None):
+    if video_path:
+        return list(iter_frames_opencv(video_path, 0.5, max_frames=NUM_FRAMES))
+
+    rng = np.random.default_rng(0)
+    return [
+        (float(i), Image.fromarray(rng.integers(0, 255, (384, 384, 3), dtype=np.uint8)))
+        for i in range(NUM_FRAMES)
+    ]
+
+
+def main():
+    frames = load_frames(sys.argv[1] if len(sys.argv) > 1 else None)
+    processor, model = load_blip_model(BLIP_MODEL, "cpu")
+
+    # Warm-up so the first measured batch size doesn't pay one-off costs
+    caption_frames(processor, model, frames[:2], "cpu", batch_size=2)
+
+    print(f"{'batch':>6} {'frames':>7} {'seconds':>9} {'frames/s':>9}")
+    for bs in BATCH_SIZES:
+        start = time.perf_counter()
+        caption_frames(processor, model, frames, "cpu", batch_size=bs)
+        elapsed = time.perf_counter() - start
+        print(f"{bs:>6} {len(frames):>7} {elapsed:>9.2f} {len(frames) / elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
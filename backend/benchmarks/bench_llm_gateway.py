@@ -0,0 +1,103 @@
+"""
+Latency under a burst of concurrent LLM requests, through the shared
+gateway, against a local fake Ollama server (no model needed).
+
+Run from backend/:
+    python -m benchmarks.bench_llm_gateway [max_in_flight]
+"""
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common.llm_gateway import BACKGROUND, INTERACTIVE, LLMBusyError, LLMGateway
+
+TOKENS = 20
+TOKEN_DELAY_S = 0.01         # fake generation speed
+INTERACTIVE_REQUESTS = 24
+BACKGROUND_REQUESTS = 8
+
+
+# =====================================================
+# FAKE OLLAMA SERVER
+# =====================================================
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """
+    Streams NDJSON like /api/generate. Generation slows down with the
+    number of concurrent requests, like a single GPU/CPU would.
+    """
+    active = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with FakeOllamaHandler.lock:
+            FakeOllamaHandler.active += 1
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for i in range(TOKENS):
+                time.sleep(TOKEN_DELAY_S * FakeOllamaHandler.active)
+                line = {"model": body["model"], "response": f"t{i} ", "done": False}
+                self.wfile.write((json.dumps(line) + "\n").encode())
+            self.wfile.write((json.dumps({"model": body["model"], "response": "", "done": True}) + "\n").encode())
+        finally:
+            with FakeOllamaHandler.lock:
+                FakeOllamaHandler.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fake_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# =====================================================
+# BENCHMARK
+# =====================================================
+
+def timed_call(gateway, priority):
+    start = time.perf_counter()
+    try:
+        gateway.invoke("hello", "fake", priority)
+        return priority, time.perf_counter() - start
+    except LLMBusyError:
+        return priority, None
+
+
+def run(max_in_flight, base_url):
+    gateway = LLMGateway(max_in_flight=max_in_flight, max_queue=64, queue_timeout=30, base_url=base_url)
+    jobs = [BACKGROUND] * BACKGROUND_REQUESTS + [INTERACTIVE] * INTERACTIVE_REQUESTS
+
+    with ThreadPoolExecutor(len(jobs)) as pool:
+        results = list(pool.map(lambda p: timed_call(gateway, p), jobs))
+
+    for priority, name in ((INTERACTIVE, "interactive"), (BACKGROUND, "background")):
+        latencies = sorted(t for p, t in results if p == priority and t is not None)
+        if latencies:
+            p50 = latencies[len(latencies) // 2] * 1000
+            p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+            print(f"  {name:<12} p50={p50:7.0f} ms  p95={p95:7.0f} ms")
+    print(f"  stats: {gateway.stats()}")
+
+
+def main():
+    server, base_url = start_fake_server()
+    limits = [int(sys.argv[1])] if len(sys.argv) > 1 else [32, 4, 2, 1]
+    try:
+        for limit in limits:
+            print(f"max_in_flight={limit}")
+            run(limit, base_url)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
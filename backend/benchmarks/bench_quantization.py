@@ -0,0 +1,56 @@
+"""
+Bytes per vector and recall@k of each vector storage mode against
+exact float32 search, with and without exact re-ranking.
+
+Run from backend/:
+    python -m benchmarks.bench_quantization [num_vectors] [index_name]
+"""
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from benchmarks.bench_ann_recall import DIM, K, NUM_QUERIES, load_vectors, recall, synthetic_vectors
+from common import index_manager
+
+STORAGES = ["float32", "float16", "int8", "pq"]
+RERANK_FACTOR = 4
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    vectors = load_vectors(sys.argv[2], n) if len(sys.argv) > 2 else synthetic_vectors(n)
+    n = len(vectors)
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(n, NUM_QUERIES, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+    exact = index_manager.build_index("flat", vectors, DIM)
+    _, truth = exact.search(queries, K)
+
+    print(f"{n} vectors, {NUM_QUERIES} queries, recall@{K}, re-rank x{RERANK_FACTOR}")
+    print(f"{'storage':<9} {'bytes/vec':>9} {'recall':>7} {'reranked':>9} {'ms/query':>9}")
+
+    for storage in STORAGES:
+        index = index_manager.build_index("flat", vectors, DIM, storage)
+        bytes_per_vector = len(faiss.serialize_index(index)) / n
+
+        start = time.perf_counter()
+        _, found = index.search(queries, K)
+        ms = (time.perf_counter() - start) * 1000 / NUM_QUERIES
+
+        _, candidates = index.search(queries, K * RERANK_FACTOR)
+        reranked = np.vstack([
+            index_manager.rerank(q, c, vectors, K)[1] for q, c in zip(queries, candidates)
+        ])
+
+        print(
+            f"{storage:<9} {bytes_per_vector:>9.1f} {recall(found, truth):>7.3f} "
+            f"{recall(reranked, truth):>9.3f} {ms:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,9 @@
-import ast
-import re
+import time
 from typing import Dict, List
 
-import asttokens
-from tree_sitter import Parser
-from tree_sitter_languages import get_language
+from code_analyzer.incremental import code_sessions, supports_incremental
+from code_analyzer.python_rules import python_engine
+from code_analyzer.query_rules import parser_for, run_rules, supports
 
 
 # =====================================================
@@ -44,12 +43,8 @@ class Suggestion:
 # =====================================================
 
 def analyze_python(source: str) -> Dict:
-    suggestions: List[Suggestion] = []
-    explanation: List[str] = []
-
     try:
-        atok = asttokens.ASTTokens(source, parse=True)
-        tree = atok.tree
+        ctx = python_engine.run(source)
     except SyntaxError as e:
         return {
             "error": f"Syntax Error: {e}",
@@ -57,49 +52,7 @@ def analyze_python(source: str) -> Dict:
             "suggestions": [],
         }
 
-    # Walk AST
-    for node in ast.walk(tree):
-
-        # ❌ input misuse
-        if isinstance(node, ast.Call) and getattr(node.func, "id", "") == "input":
-            suggestions.append(
-                Suggestion(
-                    node.lineno,
-                    "logic",
-                    "input() returns a string. Convert it using int() if numeric input is expected.",
-                )
-            )
-
-        # ❌ range(len())
-        if isinstance(node, ast.For):
-            if (
-                isinstance(node.iter, ast.Call)
-                and getattr(node.iter.func, "id", "") == "range"
-            ):
-                suggestions.append(
-                    Suggestion(
-                        node.lineno,
-                        "performance",
-                        "Prefer enumerate() instead of range(len()).",
-                    )
-                )
-
-        # ❌ open() without with
-        if isinstance(node, ast.Call) and getattr(node.func, "id", "") == "open":
-            suggestions.append(
-                Suggestion(
-                    node.lineno,
-                    "resource",
-                    "Use 'with open(...)' to ensure file closure.",
-                )
-            )
-
-    # Top-level structure
-    for node in tree.body:
-        if isinstance(node, ast.FunctionDef):
-            explanation.append(f"Function `{node.name}` defined at line {node.lineno}.")
-        if isinstance(node, ast.ClassDef):
-            explanation.append(f"Class `{node.name}` defined at line {node.lineno}.")
+    suggestions = [Suggestion(*s) for s in ctx.suggestions]
 
     if not suggestions:
         suggestions.append(
@@ -111,7 +64,7 @@ def analyze_python(source: str) -> Dict:
         )
 
     return {
-        "explanation": "\n".join(explanation),
+        "explanation": "\n".join(ctx.explanation),
         "suggestions": [s.to_dict() for s in suggestions],
     }
 
@@ -121,12 +74,11 @@ def analyze_python(source: str) -> Dict:
 # =====================================================
 
 def analyze_generic(source: str, language: str) -> Dict:
-    suggestions: List[Suggestion] = []
-
     try:
-        parser = Parser()
-        parser.language = get_language(language)
-        parser.parse(bytes(source, "utf-8"))
+        if not supports(language):
+            raise ValueError(f"no grammar for {language}")
+        source_bytes = bytes(source, "utf-8")
+        tree = parser_for(language).parse(source_bytes)
     except Exception:
         return {
             "explanation": f"{language.upper()} parsed using fallback rules.",
@@ -139,20 +91,9 @@ def analyze_generic(source: str, language: str) -> Dict:
             ],
         }
 
-    if language == "javascript" and "var " in source:
-        suggestions.append(
-            Suggestion(1, "modern-js", "Avoid var. Use let or const.")
-        )
-
-    if language in {"c", "cpp"} and "gets(" in source:
-        suggestions.append(
-            Suggestion(1, "security", "Avoid unsafe function gets().")
-        )
-
-    if language == "sql" and re.search(r"select\s+\*", source, re.I):
-        suggestions.append(
-            Suggestion(1, "sql", "Avoid SELECT * in production queries.")
-        )
+    suggestions: List[Suggestion] = [
+        Suggestion(*hit) for hit in run_rules(language, tree.root_node, source_bytes)
+    ]
 
     if not suggestions:
         suggestions.append(
@@ -188,3 +129,50 @@ def analyze_code_api(source: str, language: str) -> Dict:
         return analyze_python(source)
 
     return analyze_generic(source, language)
+
+
+# =====================================================
+# INCREMENTAL (LIVE EDITOR) ENTRY POINT
+# =====================================================
+
+def analyze_code_incremental(key: tuple, language: str, source: str = None, edits: List[Dict] = None) -> Dict:
+    """
+    Send `source` to open/reset the buffer, then `edits` (UTF-8 byte
+    ranges, see IncrementalDocument.apply) for each change. Languages
+    without a tree-sitter grammar fall back to a full analysis of `source`.
+    """
+    if language not in LANGUAGES:
+        return {
+            "error": f"Unsupported language: {language}",
+            "explanation": "",
+            "suggestions": [],
+        }
+
+    if not supports_incremental(language):
+        if source is None:
+            return {"error": "Incremental mode not available; send the full code", "resync": True}
+        return dict(analyze_code_api(source, language), incremental=None)
+
+    doc = code_sessions.get(key) if source is None else None
+    if source is not None:
+        start = time.perf_counter()
+        doc = code_sessions.open(key, language, source)
+        stats = {"edits": 0, "ms": round((time.perf_counter() - start) * 1000, 2)}
+    elif doc is None or doc.language != language:
+        return {"error": "No open document for this session; send the full code", "resync": True}
+    else:
+        try:
+            stats = doc.apply(edits or [])
+        except (KeyError, ValueError) as e:
+            return {"error": f"Invalid edit: {e}", "resync": True}
+        code_sessions.record_update(stats["ms"])
+
+    suggestions = [Suggestion(*hit[2:]) for hit in doc.hits]
+    if not suggestions:
+        suggestions.append(Suggestion(0, "clean", "No major issues detected."))
+
+    return {
+        "explanation": f"{language.upper()} code analyzed successfully.",
+        "suggestions": [s.to_dict() for s in suggestions],
+        "incremental": stats,
+    }
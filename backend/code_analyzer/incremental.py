@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from code_analyzer.query_rules import find_hits, parser_for, supports
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+CODE_SESSION_TTL_S = float(os.environ.get("STUDYBUDDY_CODE_SESSION_TTL", "1800"))
+MAX_CODE_SESSIONS = int(os.environ.get("STUDYBUDDY_MAX_CODE_SESSIONS", "200"))
+
+
+def _point(source: bytes, offset: int) -> Tuple[int, int]:
+    row = source.count(b"\n", 0, offset)
+    return row, offset - (source.rfind(b"\n", 0, offset) + 1)
+
+
+def _line_span(source: bytes, start: int, end: int) -> Tuple[int, int]:
+    line_start = source.rfind(b"\n", 0, start) + 1
+    line_end = source.find(b"\n", end)
+    return line_start, len(source) if line_end < 0 else line_end
+
+
+def _merge(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+# =====================================================
+# ONE EDITOR BUFFER
+# =====================================================
+
+class IncrementalDocument:
+    """
+    A buffer's last tree-sitter tree and rule hits. Edits are applied with
+    tree.edit() and an incremental reparse; rules are re-run only over
+    the lines around edited/changed ranges and every other hit is
+    carried over with its position shifted.
+    """
+
+    def __init__(self, language: str, source: str):
+        self.language = language
+        self.source = source.encode("utf-8")
+        self.tree = parser_for(language).parse(self.source)
+        self.hits = find_hits(language, self.tree.root_node, self.source)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def apply(self, edits: List[Dict]) -> Dict:
+        """
+        `edits` are applied in order; each is {"start", "end", "text"} with
+        start/end as UTF-8 byte offsets into the buffer as it is after the
+        previous edit. Raises ValueError for out-of-range offsets.
+        """
+        with self.lock:
+            # validate the whole batch first so a bad edit can't leave the
+            # tree half-edited
+            length = len(self.source)
+            for edit in edits:
+                start, end = int(edit["start"]), int(edit["end"])
+                if not 0 <= start <= end <= length:
+                    raise ValueError(f"Edit range {start}-{end} outside buffer of {length} bytes")
+                length += len(edit.get("text", "").encode("utf-8")) - (end - start)
+            return self._apply(edits)
+
+    def _apply(self, edits: List[Dict]) -> Dict:
+        start_time = time.perf_counter()
+        source, tree, hits = self.source, self.tree, self.hits
+        dirty: List[Tuple[int, int]] = []
+
+        for edit in edits:
+            start, end = int(edit["start"]), int(edit["end"])
+            text = edit.get("text", "").encode("utf-8")
+
+            start_point = _point(source, start)
+            old_end_point = _point(source, end)
+            source = source[:start] + text + source[end:]
+            new_end = start + len(text)
+            new_end_point = _point(source, new_end)
+            tree.edit(start, end, new_end, start_point, old_end_point, new_end_point)
+
+            delta = new_end - end
+            line_delta = new_end_point[0] - old_end_point[0]
+            shifted = []
+            for h in hits:
+                if h[1] <= start:
+                    shifted.append(h)
+                elif h[0] >= end:
+                    shifted.append((h[0] + delta, h[1] + delta, h[2] + line_delta) + h[3:])
+                # hits overlapping the edit are dropped and re-found below
+            hits = shifted
+
+            def move(offset):
+                if offset >= end:
+                    return offset + delta
+                return min(offset, new_end) if offset > start else offset
+
+            dirty = [(move(s), move(e)) for s, e in dirty] + [(start, new_end)]
+
+        parser = parser_for(self.language)
+        new_tree = parser.parse(source, tree)
+        dirty += [(r.start_byte, r.end_byte) for r in tree.changed_ranges(new_tree)]
+
+        # Re-check whole lines around each edit: a range query returns every
+        # match with a node intersecting it, so hits whose node or pattern
+        # context was touched are dropped and re-found, and structural
+        # changes further away show up in changed_ranges.
+        root = new_tree.root_node
+        regions = _merge([_line_span(source, s, e) for s, e in dirty])
+
+        for s, e in regions:
+            hits = [h for h in hits if not (h[0] <= e and h[1] >= s)]
+        for s, e in regions:
+            hits += [
+                h for h in find_hits(self.language, root, source, (s, e))
+                if h[0] <= e and h[1] >= s
+            ]
+        hits = sorted(set(hits), key=lambda h: (h[2], h[0]))
+
+        self.source, self.tree, self.hits = source, new_tree, hits
+        return {
+            "edits": len(edits),
+            "regions": len(regions),
+            "reanalyzed_bytes": sum(e - s for s, e in regions),
+            "total_bytes": len(source),
+            "ms": round((time.perf_counter() - start_time) * 1000, 2),
+        }
+
+
+# =====================================================
+# SESSION STORE
+# =====================================================
+
+class IncrementalSessions:
+    """
+    IncrementalDocument per (user, document id); idle ones expire.
+    """
+
+    def __init__(self, ttl: float = CODE_SESSION_TTL_S, max_sessions: int = MAX_CODE_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._docs: "OrderedDict[tuple, IncrementalDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.opens = 0
+        self.updates = 0
+        self.update_ms = 0.0
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.ttl
+        for key in [k for k, d in self._docs.items() if d.last_used < cutoff]:
+            del self._docs[key]
+        while len(self._docs) > self.max_sessions:
+            self._docs.popitem(last=False)
+
+    def open(self, key: tuple, language: str, source: str) -> IncrementalDocument:
+        doc = IncrementalDocument(language, source)
+        with self._lock:
+            self._evict()
+            self._docs[key] = doc
+            self.opens += 1
+        return doc
+
+    def get(self, key: tuple) -> Optional[IncrementalDocument]:
+        with self._lock:
+            self._evict()
+            doc = self._docs.get(key)
+            if doc is not None:
+                doc.last_used = time.monotonic()
+                self._docs.move_to_end(key)
+            return doc
+
+    def record_update(self, ms: float):
+        with self._lock:
+            self.updates += 1
+            self.update_ms += ms
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sessions": len(self._docs),
+                "opens": self.opens,
+                "updates": self.updates,
+                "avg_update_ms": round(self.update_ms / self.updates, 2) if self.updates else 0.0,
+            }
+
+
+code_sessions = IncrementalSessions()
+
+
+def supports_incremental(language: str) -> bool:
+    return supports(language)
@@ -0,0 +1,167 @@
+import ast
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+# =====================================================
+# RULE REGISTRY
+# =====================================================
+
+class Rule:
+    def __init__(self, name: str, node_types: tuple, func: Callable):
+        self.name = name
+        self.node_types = node_types
+        self.func = func
+
+
+RULES: List[Rule] = []
+
+
+def rule(name: str, *node_types):
+    """
+    Register `func(node, ctx)` to be called for every node of `node_types`.
+    """
+    def register(func):
+        RULES.append(Rule(name, node_types, func))
+        return func
+    return register
+
+
+class RuleContext:
+    """
+    Per-analysis state handed to rules. `tokens` (asttokens) is only
+    built if a rule asks for exact source positions.
+    """
+
+    def __init__(self, source: str, tree: ast.AST):
+        self.source = source
+        self.tree = tree
+        self.suggestions: List[tuple] = []
+        self.explanation: List[str] = []
+        self._tokens = None
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            import asttokens
+            self._tokens = asttokens.ASTTokens(self.source, tree=self.tree)
+        return self._tokens
+
+    def suggest(self, line: int, category: str, message: str):
+        self.suggestions.append((line, category, message))
+
+
+# =====================================================
+# RULES
+# =====================================================
+
+def _call_name(node: ast.Call) -> str:
+    return getattr(node.func, "id", "")
+
+
+@rule("input-conversion", ast.Call)
+def check_input(node, ctx):
+    if _call_name(node) == "input":
+        ctx.suggest(
+            node.lineno,
+            "logic",
+            "input() returns a string. Convert it using int() if numeric input is expected.",
+        )
+
+
+@rule("range-len", ast.For)
+def check_range_loop(node, ctx):
+    if isinstance(node.iter, ast.Call) and _call_name(node.iter) == "range":
+        ctx.suggest(node.lineno, "performance", "Prefer enumerate() instead of range(len()).")
+
+
+@rule("open-without-with", ast.Call)
+def check_open(node, ctx):
+    if _call_name(node) == "open":
+        ctx.suggest(node.lineno, "resource", "Use 'with open(...)' to ensure file closure.")
+
+
+@rule("structure", ast.Module)
+def explain_structure(node, ctx):
+    for child in node.body:
+        if isinstance(child, ast.FunctionDef):
+            ctx.explanation.append(f"Function `{child.name}` defined at line {child.lineno}.")
+        if isinstance(child, ast.ClassDef):
+            ctx.explanation.append(f"Class `{child.name}` defined at line {child.lineno}.")
+
+
+# =====================================================
+# ENGINE
+# =====================================================
+
+class RuleEngine:
+    """
+    Parses once and walks the tree once, dispatching each node only to
+    the rules registered for its type. Keeps cumulative per-rule timing.
+    """
+
+    def __init__(self, rules: Optional[List[Rule]] = None, timed: bool = True):
+        self.rules = list(RULES if rules is None else rules)
+        self.timed = timed
+        self.dispatch: Dict[type, List[Rule]] = {}
+        for r in self.rules:
+            for node_type in r.node_types:
+                self.dispatch.setdefault(node_type, []).append(r)
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.nodes = 0
+        self.walk_s = 0.0
+        self.rule_s = {r.name: 0.0 for r in self.rules}
+        self.rule_calls = {r.name: 0 for r in self.rules}
+
+    def run(self, source: str) -> RuleContext:
+        """
+        Raises SyntaxError for unparsable source.
+        """
+        tree = ast.parse(source)
+        ctx = RuleContext(source, tree)
+        dispatch = self.dispatch
+        rule_s = dict.fromkeys(self.rule_s, 0.0)
+        rule_calls = dict.fromkeys(self.rule_calls, 0)
+        nodes = 0
+
+        start = time.perf_counter()
+        for node in ast.walk(tree):
+            nodes += 1
+            rules = dispatch.get(type(node))
+            if not rules:
+                continue
+            for r in rules:
+                if self.timed:
+                    t0 = time.perf_counter()
+                    r.func(node, ctx)
+                    rule_s[r.name] += time.perf_counter() - t0
+                    rule_calls[r.name] += 1
+                else:
+                    r.func(node, ctx)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.runs += 1
+            self.nodes += nodes
+            self.walk_s += elapsed
+            for name in rule_s:
+                self.rule_s[name] += rule_s[name]
+                self.rule_calls[name] += rule_calls[name]
+        return ctx
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "nodes": self.nodes,
+                "nodes_per_sec": round(self.nodes / self.walk_s) if self.walk_s else 0,
+                "rules": {
+                    name: {"calls": self.rule_calls[name], "total_ms": round(self.rule_s[name] * 1000, 2)}
+                    for name in self.rule_s
+                },
+            }
+
+
+python_engine = RuleEngine()
@@ -0,0 +1,183 @@
+import logging
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+from tree_sitter_languages import get_language, get_parser
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# RULES
+# =====================================================
+
+class QueryRule:
+    """
+    A tree-sitter query; every node captured as `@hit` (and accepted by
+    `check`, if given) becomes a suggestion on that node's line.
+    `fallback` is a regex used only if the grammar rejects the query.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        query: str,
+        category: str,
+        message: str,
+        check: Optional[Callable[[object, bytes], bool]] = None,
+        fallback: Optional[str] = None,
+    ):
+        self.name = name
+        self.query = query
+        self.category = category
+        self.message = message
+        self.check = check
+        self.fallback = re.compile(fallback, re.I) if fallback else None
+
+
+def _text(node, source: bytes) -> str:
+    return source[node.start_byte:node.end_byte].decode("utf-8", "replace")
+
+
+def _called(name: str):
+    return lambda node, source: _text(node, source) == name
+
+
+_UNSAFE_C = [
+    QueryRule(
+        "gets", "(call_expression function: (identifier) @hit)",
+        "security", "Avoid unsafe function gets().", check=_called("gets"),
+    ),
+]
+
+RULES: Dict[str, List[QueryRule]] = {
+    "javascript": [
+        QueryRule("var", "(variable_declaration) @hit", "modern-js", "Avoid var. Use let or const."),
+    ],
+    "java": [
+        QueryRule(
+            "empty-catch", "(catch_clause body: (block) @hit)",
+            "reliability", "Empty catch block silently swallows the exception.",
+            check=lambda node, source: node.named_child_count == 0,
+        ),
+    ],
+    "c": _UNSAFE_C,
+    "cpp": _UNSAFE_C,
+    "sql": [
+        QueryRule(
+            "select-star", "(select_clause_body (asterisk_expression) @hit)",
+            "sql", "Avoid SELECT * in production queries.", fallback=r"select\s+\*",
+        ),
+    ],
+}
+
+
+# =====================================================
+# COMPILED QUERIES (BUILT ONCE AT IMPORT)
+# =====================================================
+
+def _compile(language, source: str):
+    if hasattr(language, "query"):
+        return language.query(source)
+    from tree_sitter import Query
+    return Query(language, source)
+
+
+def _compile_all() -> Dict[str, list]:
+    compiled = {}
+    for name, rules in RULES.items():
+        try:
+            language = get_language(name)
+        except Exception as e:
+            logger.warning("tree-sitter grammar for %s unavailable: %s", name, e)
+            continue
+        compiled[name] = []
+        for r in rules:
+            try:
+                compiled[name].append((r, _compile(language, r.query)))
+            except Exception as e:
+                logger.warning("query %s/%s not supported by grammar: %s", name, r.name, e)
+                compiled[name].append((r, None))
+    return compiled
+
+
+COMPILED = _compile_all()
+
+
+_query_lock = threading.Lock()
+
+
+def _captures(query, node, byte_range=None) -> list:
+    if hasattr(query, "set_byte_range"):
+        # py-tree-sitter 0.23-0.24 keeps the range on the shared query
+        with _query_lock:
+            query.set_byte_range(byte_range or (0, node.end_byte))
+            result = query.captures(node)
+    elif hasattr(query, "captures"):
+        kwargs = {"start_byte": byte_range[0], "end_byte": byte_range[1]} if byte_range else {}
+        result = query.captures(node, **kwargs)
+    else:
+        from tree_sitter import QueryCursor
+        cursor = QueryCursor(query)
+        if byte_range:
+            cursor.set_byte_range(*byte_range)
+        result = cursor.captures(node)
+    # dict {name: [nodes]} in newer py-tree-sitter, [(node, name)] before
+    if isinstance(result, dict):
+        return [n for n in result.get("hit", [])]
+    return [n for n, name in result if name == "hit"]
+
+
+# =====================================================
+# PARSERS (ONE PER LANGUAGE PER THREAD)
+# =====================================================
+
+_local = threading.local()
+
+
+def parser_for(language: str):
+    parsers = getattr(_local, "parsers", None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+    if language not in parsers:
+        parsers[language] = get_parser(language)
+    return parsers[language]
+
+
+def supports(language: str) -> bool:
+    return language in COMPILED
+
+
+# =====================================================
+# RUNNING RULES
+# =====================================================
+
+def find_hits(language: str, node, source: bytes, byte_range=None) -> List[tuple]:
+    """
+    (start_byte, end_byte, line, category, message) for every rule hit
+    inside `node`, optionally only those intersecting `byte_range`.
+    """
+    hits = []
+    for r, query in COMPILED.get(language, []):
+        if query is not None:
+            for hit in _captures(query, node, byte_range):
+                if r.check is None or r.check(hit, source):
+                    hits.append((hit.start_byte, hit.end_byte, hit.start_point[0] + 1, r.category, r.message))
+        elif r.fallback is not None:
+            start, end = byte_range or (node.start_byte, node.end_byte)
+            text = source[start:end].decode("utf-8", "replace")
+            first_line = source.count(b"\n", 0, start) + 1
+            for m in r.fallback.finditer(text):
+                hit_start = start + len(text[:m.start()].encode("utf-8"))
+                hit_end = hit_start + len(m.group(0).encode("utf-8"))
+                hits.append((hit_start, hit_end, first_line + text.count("\n", 0, m.start()), r.category, r.message))
+    hits.sort(key=lambda h: (h[2], h[0]))
+    return hits
+
+
+def run_rules(language: str, node, source: bytes) -> List[tuple]:
+    """
+    (line, category, message) for every rule hit inside `node`.
+    """
+    return [hit[2:] for hit in find_hits(language, node, source)]
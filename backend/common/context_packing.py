@@ -0,0 +1,140 @@
+import logging
+import math
+import os
+import threading
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("STUDYBUDDY_CONTEXT_TOKENS", "1024"))
+CHARS_PER_TOKEN = 4          # rough average for English text
+MIN_PARTIAL_TOKENS = 48      # don't bother appending a tail smaller than this
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def find_offsets(text: str, chunks: List[str]) -> List[int]:
+    """
+    Start offset of each chunk in `text` (chunks in document order), or
+    None where the splitter changed whitespace and the chunk isn't verbatim.
+    """
+    offsets = []
+    cursor = 0
+    for chunk in chunks:
+        pos = text.find(chunk, cursor)
+        offsets.append(pos if pos >= 0 else None)
+        if pos >= 0:
+            cursor = pos + 1
+    return offsets
+
+
+def merge_segments(hits: List[Tuple[Dict, float]]) -> List[Dict]:
+    """
+    Merge retrieved chunks from the same document version (`doc_id`)
+    whose [start, end) ranges overlap or touch, dropping the repeated
+    text. Each segment keeps the best (lowest) distance of its chunks.
+    Chunks without a doc_id are never merged by offset: a filename or
+    URL alone can cover several versions of the text.
+    """
+    with_offsets = {}
+    segments = []
+    seen_text = set()
+
+    for record, distance in hits:
+        if record.get("start") is None or record.get("doc_id") is None:
+            if record["text"] not in seen_text:
+                seen_text.add(record["text"])
+                segments.append({"text": record["text"], "distance": distance})
+            continue
+        with_offsets.setdefault(record["doc_id"], []).append((record, distance))
+
+    for items in with_offsets.values():
+        items.sort(key=lambda item: item[0]["start"])
+        current = None
+        for record, distance in items:
+            start = record["start"]
+            end = start + len(record["text"])
+            if current is not None and start <= current["end"]:
+                if end > current["end"]:
+                    current["text"] += record["text"][current["end"] - start:]
+                    current["end"] = end
+                current["distance"] = min(current["distance"], distance)
+                continue
+            if current is not None:
+                segments.append(current)
+            current = {"text": record["text"], "start": start, "end": end, "distance": distance}
+        if current is not None:
+            segments.append(current)
+
+    segments.sort(key=lambda seg: seg["distance"])
+    return segments
+
+
+# =====================================================
+# CONTEXT PACKING
+# =====================================================
+
+_lock = threading.Lock()
+packing_totals = {"queries": 0, "naive_tokens": 0, "packed_tokens": 0}
+
+
+def pack_context(
+    hits: List[Tuple[Dict, float]], token_budget: int = CONTEXT_TOKEN_BUDGET
+) -> Tuple[str, Dict]:
+    """
+    Build the prompt context from search hits: merge overlapping chunks,
+    order by score and fill `token_budget`. Returns (context, stats).
+    """
+    naive_tokens = estimate_tokens("\n\n".join(record["text"] for record, _ in hits))
+
+    parts = []
+    used = 0
+    for seg in merge_segments(hits):
+        tokens = estimate_tokens(seg["text"])
+        remaining = token_budget - used
+        if tokens <= remaining:
+            parts.append(seg["text"])
+            used += tokens
+        elif remaining >= MIN_PARTIAL_TOKENS:
+            parts.append(seg["text"][: remaining * CHARS_PER_TOKEN])
+            used = token_budget
+        if used >= token_budget:
+            break
+
+    context = "\n\n".join(parts)
+    stats = {
+        "chunks": len(hits),
+        "segments": len(parts),
+        "naive_tokens": naive_tokens,
+        "packed_tokens": estimate_tokens(context),
+    }
+    stats["tokens_saved"] = stats["naive_tokens"] - stats["packed_tokens"]
+    logger.info("context packing: %s", stats)
+
+    with _lock:
+        packing_totals["queries"] += 1
+        packing_totals["naive_tokens"] += stats["naive_tokens"]
+        packing_totals["packed_tokens"] += stats["packed_tokens"]
+
+    return context, stats
+
+
+def packing_stats() -> Dict:
+    with _lock:
+        totals = dict(packing_totals)
+    totals["tokens_saved"] = totals["naive_tokens"] - totals["packed_tokens"]
+    totals["avg_saved_per_query"] = (
+        round(totals["tokens_saved"] / totals["queries"], 1) if totals["queries"] else 0.0
+    )
+    return totals
@@ -0,0 +1,178 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from common.context_packing import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+MEMORY_WINDOW_TOKENS = int(os.environ.get("STUDYBUDDY_MEMORY_TOKENS", "512"))
+MEMORY_SUMMARY_TOKENS = int(os.environ.get("STUDYBUDDY_MEMORY_SUMMARY_TOKENS", "160"))
+SESSION_TTL_S = float(os.environ.get("STUDYBUDDY_SESSION_TTL", "3600"))
+MAX_SESSIONS = int(os.environ.get("STUDYBUDDY_MAX_SESSIONS", "500"))
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation with the new turns below. "
+    "Keep names, facts and open questions; stay under {words} words.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "New turns:\n{turns}\n\n"
+    "Updated summary:"
+)
+
+
+def format_turns(turns: List[Tuple[str, str]]) -> str:
+    return "\n".join(f"{role.capitalize()}: {text}" for role, text in turns)
+
+
+# =====================================================
+# PER-SESSION MEMORY
+# =====================================================
+
+class ConversationMemory:
+    """
+    Recent turns up to `window_tokens`, plus a rolling summary of
+    everything older. Turns that fall out of the window are folded into
+    the summary on a background thread, so render() stays roughly
+    window + summary tokens no matter how long the conversation runs.
+    """
+
+    def __init__(self, window_tokens: int, summarize, executor: ThreadPoolExecutor):
+        self.window_tokens = window_tokens
+        self.summary = ""
+        self._summarize = summarize
+        self._executor = executor
+        self._turns: deque = deque()
+        self._tokens = 0
+        self._pending: List[Tuple[str, str]] = []
+        self._compacting = False
+        self._lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.compactions = 0
+        # Bumped on every added turn, so callers can tell it's unchanged
+        self.version = 0
+
+    def add_user_message(self, text: str):
+        self._add("human", text)
+
+    def add_ai_message(self, text: str):
+        self._add("ai", text)
+
+    def _add(self, role: str, text: str):
+        text = text if isinstance(text, str) else str(text)
+        tokens = estimate_tokens(text)
+        with self._lock:
+            self.last_used = time.monotonic()
+            self.version += 1
+            self._turns.append((role, text, tokens))
+            self._tokens += tokens
+            # always keep the latest turn, even if it alone exceeds the window
+            while self._tokens > self.window_tokens and len(self._turns) > 1:
+                old_role, old_text, old_tokens = self._turns.popleft()
+                self._tokens -= old_tokens
+                self._pending.append((old_role, old_text))
+            schedule = bool(self._pending) and not self._compacting
+            if schedule:
+                self._compacting = True
+        if schedule:
+            self._executor.submit(self._compact)
+
+    def _compact(self):
+        while True:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                summary = self.summary
+                if not batch:
+                    self._compacting = False
+                    return
+            try:
+                summary = self._summarize(summary, format_turns(batch))
+            except Exception as e:
+                # keep the previous summary; the dropped turns are lost
+                logger.warning("memory compaction failed: %s", e)
+            with self._lock:
+                self.summary = summary.strip()[: MEMORY_SUMMARY_TOKENS * CHARS_PER_TOKEN]
+                self.compactions += 1
+
+    def render(self) -> str:
+        with self._lock:
+            recent = format_turns([(role, text) for role, text, _ in self._turns])
+            if self.summary:
+                return f"Summary of earlier conversation: {self.summary}\n{recent}"
+            return recent
+
+    def __len__(self):
+        with self._lock:
+            return len(self._turns)
+
+
+class SessionMemoryStore:
+    """
+    ConversationMemory per session id. Sessions idle for `ttl` seconds,
+    or beyond `max_sessions` (least recently used first), are dropped.
+    """
+
+    def __init__(
+        self,
+        llm,
+        window_tokens: int = MEMORY_WINDOW_TOKENS,
+        ttl: float = SESSION_TTL_S,
+        max_sessions: int = MAX_SESSIONS,
+    ):
+        self.llm = llm
+        self.window_tokens = window_tokens
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary")
+        self.evictions = 0
+        self.summaries = 0
+
+    def _summarize(self, summary: str, turns: str) -> str:
+        self.summaries += 1
+        response = self.llm.invoke(SUMMARY_PROMPT.format(
+            words=int(MEMORY_SUMMARY_TOKENS * 0.75), summary=summary or "(none)", turns=turns,
+        ))
+        return response if isinstance(response, str) else str(response)
+
+    def get(self, session_id) -> ConversationMemory:
+        session_id = session_id or "anonymous"
+        with self._lock:
+            self._evict()
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                memory = ConversationMemory(self.window_tokens, self._summarize, self._executor)
+                self._sessions[session_id] = memory
+            memory.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return memory
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.ttl
+        for session_id in [s for s, m in self._sessions.items() if m.last_used < cutoff]:
+            del self._sessions[session_id]
+            self.evictions += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._evict()
+            memories = list(self._sessions.values())
+        return {
+            "sessions": len(memories),
+            "evictions": self.evictions,
+            "window_tokens": self.window_tokens,
+            "summaries": self.summaries,
+            "max_prompt_tokens": max((estimate_tokens(m.render()) for m in memories), default=0),
+        }
@@ -0,0 +1,127 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common.embedding_cache import chunk_hash, embedding_cache
+from common.model_pool import model_pool
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+DEFAULT_EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# How long the first query in a batch waits for others to join it
+EMBED_MAX_WAIT_MS = float(os.environ.get("STUDYBUDDY_EMBED_MAX_WAIT_MS", "5"))
+EMBED_MAX_BATCH = 32
+
+
+# =====================================================
+# EMBEDDING SERVICE
+# =====================================================
+
+class EmbeddingService:
+    """
+    One lazily-loaded embedding model shared by every RAG module.
+    Concurrent embed_query() calls are micro-batched into one forward pass.
+    Drop-in for HuggingFaceEmbeddings (embed_documents / embed_query).
+    """
+
+    def __init__(self, model_name: str, max_wait_ms: float = EMBED_MAX_WAIT_MS, max_batch: int = EMBED_MAX_BATCH):
+        self.model_name = model_name
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+
+    def _model(self):
+        def _load():
+            from langchain_huggingface import HuggingFaceEmbeddings
+            return HuggingFaceEmbeddings(model_name=self.model_name)
+
+        return model_pool.get(("embeddings", self.model_name, "cpu"), _load)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._model().embed_documents(texts)
+
+    def embed_documents_cached(
+        self, texts: List[str], hashes: Optional[List[str]] = None
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Embed texts, sending only embedding-cache misses to the model.
+        Returns (float32 vectors, number of texts served from the cache).
+        """
+        hashes = hashes or [chunk_hash(t) for t in texts]
+        found = embedding_cache.get_many(self.model_name, hashes)
+
+        missing = {h: t for h, t in zip(hashes, texts) if h not in found}
+        if missing:
+            vectors = np.asarray(self.embed_documents(list(missing.values())), dtype=np.float32)
+            computed = dict(zip(missing.keys(), vectors))
+            embedding_cache.put_many(self.model_name, computed)
+            found.update(computed)
+
+        hits = sum(1 for h in hashes if h not in missing)
+        return np.vstack([found[h] for h in hashes]), hits
+
+    def embed_query(self, text: str) -> List[float]:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+
+            try:
+                vectors = self._model().embed_documents([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.queries += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self) -> Dict:
+        return {
+            "model": self.model_name,
+            "query_batches": self.batches,
+            "queries": self.queries,
+            "avg_batch": round(self.queries / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embeddings(model_name: str = DEFAULT_EMBED_MODEL) -> EmbeddingService:
+    with _services_lock:
+        if model_name not in _services:
+            _services[model_name] = EmbeddingService(model_name)
+        return _services[model_name]
@@ -0,0 +1,176 @@
+import math
+import os
+
+import faiss
+import numpy as np
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# Corpus size at which the flat index is migrated to IVF, and IVF to HNSW.
+# Set a threshold to 0 to disable that stage.
+IVF_MIN_VECTORS = int(os.environ.get("STUDYBUDDY_IVF_MIN_VECTORS", "50000"))
+HNSW_MIN_VECTORS = int(os.environ.get("STUDYBUDDY_HNSW_MIN_VECTORS", "0"))
+
+# An IVF index is retrained once the corpus has grown this much since training
+IVF_RETRAIN_GROWTH = 4.0
+IVF_TRAIN_POINTS_PER_LIST = 64
+
+IVF_NPROBE = int(os.environ.get("STUDYBUDDY_IVF_NPROBE", "16"))
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = int(os.environ.get("STUDYBUDDY_HNSW_EF_SEARCH", "64"))
+
+# Vector storage: float32 | float16 | int8 (scalar quantization) | pq
+VECTOR_STORAGE = os.environ.get("STUDYBUDDY_VECTOR_STORAGE", "float32")
+# Quantizers need training data, so stay float32 until this many vectors
+QUANTIZE_MIN_VECTORS = 2048
+PQ_SUBQUANTIZERS = 48   # 384 dims -> 8 dims per sub-quantizer, 48 bytes/vector
+TRAIN_SAMPLE_MIN = 16384
+
+# Re-rank k * RERANK_FACTOR quantized candidates with exact distances (0 = off)
+RERANK_FACTOR = int(os.environ.get("STUDYBUDDY_RERANK_FACTOR", "0"))
+
+SQ_TYPES = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+# =====================================================
+# INDEX KINDS
+# =====================================================
+
+def index_kind(index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def index_storage(index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "float16" if index.sq.qtype == SQ_TYPES["float16"] else "int8"
+    return "float32"
+
+
+def ivf_nlist(n: int) -> int:
+    return max(1, min(65536, int(4 * math.sqrt(n))))
+
+
+def target_kind(index) -> str:
+    """
+    The kind of index the corpus should be using at its current size.
+    Returns the current kind if no migration is due.
+    """
+    n = index.ntotal
+    if HNSW_MIN_VECTORS and n >= HNSW_MIN_VECTORS:
+        return "hnsw"
+    if IVF_MIN_VECTORS and n >= IVF_MIN_VECTORS:
+        return "ivf"
+    return index_kind(index)
+
+
+def target_storage(index, storage: str = VECTOR_STORAGE) -> str:
+    if storage == "float32":
+        return storage
+    if index.ntotal >= QUANTIZE_MIN_VECTORS:
+        return storage
+    return index_storage(index)
+
+
+def needs_rebuild(index, storage: str = VECTOR_STORAGE) -> bool:
+    kind = index_kind(index)
+    if target_kind(index) != kind:
+        return True
+    if target_storage(index, storage) != index_storage(index):
+        return True
+    if kind == "ivf":
+        # nlist = 4 * sqrt(n_trained), so n_trained = nlist^2 / 16
+        ivf = faiss.extract_index_ivf(index)
+        return index.ntotal >= IVF_RETRAIN_GROWTH * ivf.nlist ** 2 / 16
+    return False
+
+
+def apply_search_params(index, nprobe: int = None, ef_search: int = None):
+    kind = index_kind(index)
+    if kind == "ivf":
+        faiss.extract_index_ivf(index).nprobe = nprobe or IVF_NPROBE
+    elif kind == "hnsw":
+        faiss.downcast_index(index).hnsw.efSearch = ef_search or HNSW_EF_SEARCH
+    return index
+
+
+def read_vectors(index, start: int = 0, n: int = None) -> np.ndarray:
+    n = index.ntotal - start if n is None else n
+    if index_kind(index) == "ivf":
+        faiss.extract_index_ivf(index).make_direct_map()
+    return index.reconstruct_n(start, n)
+
+
+def build_index(kind: str, vectors: np.ndarray, dim: int, storage: str = "float32"):
+    """
+    Build a fresh index of `kind` with `storage` holding `vectors` (in the
+    same order, so vector ids are preserved).
+    """
+    n = len(vectors)
+    sq_type = SQ_TYPES.get(storage)
+
+    if kind == "ivf":
+        nlist = ivf_nlist(n)
+        quantizer = faiss.IndexFlatL2(dim)
+        if storage == "pq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, PQ_SUBQUANTIZERS, 8)
+        elif sq_type is not None:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, sq_type, faiss.METRIC_L2)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        train_size = max(nlist * IVF_TRAIN_POINTS_PER_LIST, TRAIN_SAMPLE_MIN)
+    elif kind == "hnsw":
+        if storage == "pq":
+            index = faiss.IndexHNSWPQ(dim, PQ_SUBQUANTIZERS, HNSW_M)
+        elif sq_type is not None:
+            index = faiss.IndexHNSWSQ(dim, sq_type, HNSW_M)
+        else:
+            index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        train_size = TRAIN_SAMPLE_MIN
+    else:
+        if storage == "pq":
+            index = faiss.IndexPQ(dim, PQ_SUBQUANTIZERS, 8)
+        elif sq_type is not None:
+            index = faiss.IndexScalarQuantizer(dim, sq_type)
+        else:
+            index = faiss.IndexFlatL2(dim)
+        train_size = TRAIN_SAMPLE_MIN
+
+    if not index.is_trained:
+        rng = np.random.default_rng(0)
+        index.train(vectors[rng.choice(n, min(n, train_size), replace=False)])
+
+    if n:
+        index.add(vectors)
+    return apply_search_params(index)
+
+
+def rerank(query: np.ndarray, ids: np.ndarray, vectors: np.ndarray, k: int):
+    """
+    Exact L2 re-ranking of candidate ids against full-precision vectors.
+    Returns (distances, ids) shaped like index.search() output for one query.
+    """
+    ids = ids[ids >= 0]
+    if not len(ids):
+        return np.empty((1, 0), dtype=np.float32), np.empty((1, 0), dtype=np.int64)
+    candidates = np.asarray(vectors[np.sort(ids)], dtype=np.float32)
+    dist = ((candidates - query.reshape(1, -1)) ** 2).sum(axis=1)
+    order = np.argsort(dist)[:k]
+    return dist[order].reshape(1, -1), np.sort(ids)[order].reshape(1, -1)
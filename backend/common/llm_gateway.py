@@ -0,0 +1,214 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# Point at a fake server for load tests, e.g. http://127.0.0.1:11500
+OLLAMA_URL = os.environ.get("STUDYBUDDY_OLLAMA_URL") or None
+LLM_MAX_IN_FLIGHT = int(os.environ.get("STUDYBUDDY_LLM_MAX_IN_FLIGHT", "2"))
+LLM_MAX_QUEUE = int(os.environ.get("STUDYBUDDY_LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT_S = float(os.environ.get("STUDYBUDDY_LLM_QUEUE_TIMEOUT", "60"))
+
+# Priority classes: lower value is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class LLMBusyError(RuntimeError):
+    """
+    Raised when the wait queue is full or a request waited longer than
+    its queue timeout for a generation slot.
+    """
+
+
+# =====================================================
+# LLM GATEWAY
+# =====================================================
+
+class LLMGateway:
+    """
+    Single entry point to the local Ollama server. At most
+    `max_in_flight` generations run at once; further requests wait in a
+    bounded priority queue (interactive before background, FIFO within a
+    class) and give up after `queue_timeout` seconds. One client per
+    model is shared, so HTTP connections are pooled and kept alive.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = LLM_MAX_IN_FLIGHT,
+        max_queue: int = LLM_MAX_QUEUE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT_S,
+        base_url: Optional[str] = OLLAMA_URL,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.base_url = base_url
+        self._clients: Dict[str, object] = {}
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self.peak_queue = 0
+        self._counters = {
+            p: {"requests": 0, "rejected": 0, "timeouts": 0, "wait_s": 0.0, "max_wait_s": 0.0}
+            for p in PRIORITY_NAMES
+        }
+
+    # -------------------------
+    # Clients
+    # -------------------------
+
+    def client(self, model: str):
+        with self._cond:
+            if model not in self._clients:
+                from langchain_ollama import OllamaLLM
+
+                kwargs = {"model": model}
+                if self.base_url:
+                    kwargs["base_url"] = self.base_url
+                try:
+                    import httpx
+                    kwargs["client_kwargs"] = {
+                        "limits": httpx.Limits(
+                            max_connections=self.max_in_flight,
+                            max_keepalive_connections=self.max_in_flight,
+                        )
+                    }
+                except Exception:
+                    pass
+                self._clients[model] = OllamaLLM(**kwargs)
+            return self._clients[model]
+
+    # -------------------------
+    # Slots
+    # -------------------------
+
+    def acquire(self, priority: int = INTERACTIVE, timeout: Optional[float] = None):
+        timeout = self.queue_timeout if timeout is None else timeout
+        counters = self._counters[priority]
+        start = time.monotonic()
+
+        with self._cond:
+            counters["requests"] += 1
+            if self._in_flight < self.max_in_flight and not self._waiting:
+                self._in_flight += 1
+                return
+
+            if len(self._waiting) >= self.max_queue:
+                counters["rejected"] += 1
+                raise LLMBusyError(f"LLM queue full ({self.max_queue} waiting)")
+
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            self.peak_queue = max(self.peak_queue, len(self._waiting))
+
+            deadline = start + timeout
+            while self._in_flight >= self.max_in_flight or self._waiting[0] != ticket:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    counters["timeouts"] += 1
+                    self._cond.notify_all()
+                    raise LLMBusyError(f"Timed out after {timeout:.0f}s waiting for the LLM")
+                self._cond.wait(remaining)
+
+            heapq.heappop(self._waiting)
+            self._in_flight += 1
+            waited = time.monotonic() - start
+            counters["wait_s"] += waited
+            counters["max_wait_s"] = max(counters["max_wait_s"], waited)
+            # another slot may still be free for the next waiter
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    # -------------------------
+    # Generation
+    # -------------------------
+
+    def invoke(self, prompt: str, model: str, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> str:
+        client = self.client(model)
+        self.acquire(priority, timeout)
+        try:
+            return client.invoke(prompt)
+        finally:
+            self.release()
+
+    def stream(self, prompt: str, model: str, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        The slot is taken when iteration starts and held until the
+        generator finishes or is closed (e.g. the client disconnects).
+        """
+        client = self.client(model)
+        self.acquire(priority, timeout)
+        try:
+            yield from client.stream(prompt)
+        finally:
+            self.release()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            by_priority = {}
+            for p, c in self._counters.items():
+                served = c["requests"] - c["rejected"] - c["timeouts"]
+                by_priority[PRIORITY_NAMES[p]] = {
+                    "requests": c["requests"],
+                    "rejected": c["rejected"],
+                    "timeouts": c["timeouts"],
+                    "avg_wait_ms": round(c["wait_s"] / served * 1000, 1) if served > 0 else 0.0,
+                    "max_wait_ms": round(c["max_wait_s"] * 1000, 1),
+                }
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._waiting),
+                "peak_queue_depth": self.peak_queue,
+                "max_queue": self.max_queue,
+                "priorities": by_priority,
+            }
+
+
+llm_gateway = LLMGateway()
+
+
+# =====================================================
+# MODULE-FACING HANDLE
+# =====================================================
+
+class GatewayLLM:
+    """
+    Drop-in for OllamaLLM (invoke / stream) that routes every call
+    through the shared gateway at a fixed priority.
+    """
+
+    def __init__(self, model: str, priority: int = INTERACTIVE, gateway: LLMGateway = llm_gateway):
+        self.model = model
+        self.priority = priority
+        self.gateway = gateway
+
+    def invoke(self, prompt: str) -> str:
+        return self.gateway.invoke(prompt, self.model, self.priority)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        return self.gateway.stream(prompt, self.model, self.priority)
+
+
+def get_llm(model: str = "mistral", priority: int = INTERACTIVE) -> GatewayLLM:
+    return GatewayLLM(model, priority)
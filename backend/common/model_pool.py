@@ -0,0 +1,119 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# Total RAM/VRAM budget for cached model weights (MB)
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("STUDYBUDDY_MODEL_MEMORY_MB", "4096"))
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+
+def estimate_model_bytes(obj: Any) -> int:
+    """
+    Approximate the memory held by a model (parameters + buffers).
+    Tuples/lists (e.g. a BLIP processor + model pair) are summed.
+    """
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_model_bytes(o) for o in obj)
+
+    # LangChain wrappers (e.g. HuggingFaceEmbeddings) hold the model as a client
+    for attr in ("client", "_client"):
+        inner = getattr(obj, attr, None)
+        if inner is not None and callable(getattr(inner, "parameters", None)):
+            return estimate_model_bytes(inner)
+
+    total = 0
+    for attr in ("parameters", "buffers"):
+        fn = getattr(obj, attr, None)
+        if not callable(fn):
+            continue
+        try:
+            for t in fn():
+                total += t.numel() * t.element_size()
+        except Exception:
+            pass
+    return total
+
+
+# =====================================================
+# MODEL POOL
+# =====================================================
+
+class ModelPool:
+    """
+    Process-wide registry that loads each (kind, name, device) once
+    and evicts least-recently-used models when over budget.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._models: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key][0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given key; others wait and then hit
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    return self._models[key][0]
+
+            model = loader()
+            size = estimate_model_bytes(model)
+
+            with self._lock:
+                self._models[key] = (model, size)
+                self.loads += 1
+                self._evict(keep=key)
+                self._load_locks.pop(key, None)
+
+        return model
+
+    def _evict(self, keep: Hashable):
+        while self.used_bytes() > self.budget_bytes and len(self._models) > 1:
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            self._models.pop(oldest)
+            self.evictions += 1
+
+    def used_bytes(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "cached": [list(k) if isinstance(k, tuple) else k for k in self._models],
+                "used_mb": round(self.used_bytes() / (1024 * 1024), 1),
+                "budget_mb": round(self.budget_bytes / (1024 * 1024), 1),
+            }
+
+
+model_pool = ModelPool(MODEL_MEMORY_BUDGET_MB * 1024 * 1024)
@@ -0,0 +1,106 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+QUERY_EMBED_CACHE_SIZE = int(os.environ.get("STUDYBUDDY_QUERY_CACHE_SIZE", "1024"))
+ANSWER_CACHE_SIZE = int(os.environ.get("STUDYBUDDY_ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL_S = float(os.environ.get("STUDYBUDDY_ANSWER_CACHE_TTL", "3600"))
+
+
+# =====================================================
+# LRU + TTL CACHE
+# =====================================================
+
+class LRUCache:
+    """
+    Thread-safe LRU map with an optional per-entry TTL (0 = no expiry).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires and expires < time.monotonic():
+                del self._data[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        expires = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+
+query_embedding_cache = LRUCache(QUERY_EMBED_CACHE_SIZE)
+answer_cache = LRUCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_S)
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+
+def normalize_question(question: str) -> str:
+    text = re.sub(r"\s+", " ", question.strip().lower())
+    return text.rstrip(" ?!.")
+
+
+def embed_query_cached(embeddings, question: str) -> List[float]:
+    key = (embeddings.model_name, normalize_question(question))
+    vector = query_embedding_cache.get(key)
+    if vector is None:
+        vector = embeddings.embed_query(question)
+        query_embedding_cache.put(key, vector)
+    return vector
+
+
+def answer_key(store, question: str, chunk_ids: List[int], model: str) -> tuple:
+    """
+    Keyed on the index version as well, so any change to the index
+    invalidates every answer computed against it.
+    """
+    return (store.name, store.version, normalize_question(question), tuple(chunk_ids), model)
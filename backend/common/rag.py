@@ -0,0 +1,156 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common.context_packing import pack_context
+from common.embedding_cache import chunk_hash
+from common.query_cache import answer_cache, answer_key, embed_query_cached
+from common.semantic_cache import semantic_cache
+from common.streaming import answer_events
+from common.vector_index import VectorIndex
+
+
+# =====================================================
+# INGEST
+# =====================================================
+
+def add_chunks(
+    store: VectorIndex,
+    embeddings,
+    chunks: List[str],
+    source: Dict,
+    doc_id: Optional[str] = None,
+    offsets: Optional[List[Optional[int]]] = None,
+) -> Tuple[int, int, int]:
+    """
+    Embed one batch of chunks and append it to `store`, each record being
+    `source` plus the chunk's text and start offset. Chunks already in
+    the index are skipped; cached embeddings are reused.
+    Returns (added, duplicates, embedding_cache_hits). Raises ValueError
+    if the embedding size doesn't match the index.
+    """
+    offsets = offsets or [None] * len(chunks)
+    by_hash = {chunk_hash(chunk): (chunk, start) for chunk, start in zip(chunks, offsets)}
+    hashes = store.new_hashes(list(by_hash))
+    duplicates = len(chunks) - len(hashes)
+    if not hashes:
+        return 0, duplicates, 0
+
+    new_chunks = [by_hash[h][0] for h in hashes]
+    vectors, cache_hits = embeddings.embed_documents_cached(new_chunks, hashes)
+
+    if vectors.shape[1] != store.dim:
+        raise ValueError(f"Embedding dimension mismatch: expected {store.dim}, got {vectors.shape[1]}")
+
+    records = [dict(source, text=by_hash[h][0], start=by_hash[h][1]) for h in hashes]
+    store.add(vectors, records, doc_id, hashes)
+    return len(new_chunks), duplicates, cache_hits
+
+
+# =====================================================
+# RETRIEVAL + QA
+# =====================================================
+
+class RAGAnswerer:
+    """
+    Question answering over one VectorIndex: embed the question, search,
+    reuse an exact or semantic cached answer if there is one, otherwise
+    pack the hits into `prompt` ({context}, {query}) for the LLM.
+    `source_field` is the record field reported with each source.
+    """
+
+    def __init__(
+        self,
+        store: VectorIndex,
+        embeddings,
+        llm,
+        model: str,
+        prompt: str,
+        source_field: str,
+        k: int,
+        empty_message: str,
+        no_hits_message: str,
+    ):
+        self.store = store
+        self.embeddings = embeddings
+        self.llm = llm
+        self.model = model
+        self.prompt = prompt
+        self.source_field = source_field
+        self.k = k
+        self.empty_message = empty_message
+        self.no_hits_message = no_hits_message
+
+    def prepare(self, query: str) -> Dict:
+        """
+        Retrieval half of answer(). Returns {"answer", "sources"} when no
+        LLM call is needed (no data, cache hit), otherwise
+        {"prompt", "sources", "packing", "complete"} where
+        complete(answer) caches it.
+        """
+        store = self.store
+        if store.ntotal == 0:
+            return {"answer": self.empty_message, "sources": []}
+
+        query_vector = np.array(
+            embed_query_cached(self.embeddings, query), dtype=np.float32
+        ).reshape(1, -1)
+
+        if query_vector.shape[1] != store.dim:
+            return {"answer": "Query embedding dimension mismatch.", "sources": []}
+
+        hits = store.search(query_vector, k=self.k)
+        if not hits:
+            return {"answer": self.no_hits_message, "sources": []}
+
+        sources = [
+            {"id": record["id"], self.source_field: record[self.source_field], "distance": round(distance, 4)}
+            for record, distance in hits
+        ]
+
+        context_ids = [record["id"] for record, _ in hits]
+        key = answer_key(store, query, context_ids, self.model)
+        cached = answer_cache.get(key)
+        if cached is None:
+            cached = semantic_cache.lookup(query_vector[0], store.name, context_ids, self.model)
+        if cached is not None:
+            return {"answer": cached, "sources": sources, "cached": True}
+
+        context, packing = pack_context(hits)
+
+        def complete(answer: str):
+            answer_cache.put(key, answer)
+            semantic_cache.add(query_vector[0], store.name, context_ids, self.model, answer)
+
+        return {
+            "prompt": self.prompt.format(context=context, query=query),
+            "sources": sources,
+            "packing": packing,
+            "complete": complete,
+        }
+
+    def answer(self, query: str) -> str:
+        prepared = self.prepare(query)
+        if "answer" in prepared:
+            return prepared["answer"]
+
+        answer = self.llm.invoke(prepared["prompt"])
+        answer = answer if isinstance(answer, str) else str(answer)
+        prepared["complete"](answer)
+        return answer
+
+    def stream(self, query: str):
+        """
+        Same as answer() but yields (event, data) pairs: retrieval
+        metadata first, then answer tokens as they are generated.
+        """
+        prepared = self.prepare(query)
+        metadata = {
+            "sources": prepared["sources"],
+            "cached": prepared.get("cached", False),
+            "packing": prepared.get("packing"),
+        }
+        return answer_events(
+            self.llm, prepared.get("prompt"), metadata,
+            answer=prepared.get("answer"), on_complete=prepared.get("complete"),
+        )
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+RESULT_CACHE_DIR = os.environ.get(
+    "STUDYBUDDY_RESULT_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "studybuddy_results"),
+)
+RESULT_CACHE_MAX_MB = int(os.environ.get("STUDYBUDDY_RESULT_CACHE_MB", "512"))
+
+HASH_CHUNK_BYTES = 1 << 20
+
+
+# =====================================================
+# HASHING
+# =====================================================
+
+def save_and_hash(stream, path: str) -> str:
+    """
+    Copy an upload stream to `path`, hashing it (BLAKE2b) on the way.
+    """
+    h = hashlib.blake2b(digest_size=32)
+    with open(path, "wb") as out:
+        while True:
+            chunk = stream.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            h.update(chunk)
+            out.write(chunk)
+    return h.hexdigest()
+
+
+def make_key(content_hash: str, params: Dict) -> str:
+    blob = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.blake2b(
+        f"{content_hash}:{blob}".encode("utf-8"), digest_size=32
+    ).hexdigest()
+
+
+# =====================================================
+# ON-DISK LRU STORE
+# =====================================================
+
+class ResultCache:
+    """
+    JSON results stored one file per key, evicted least-recently-used
+    once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            st = os.stat(os.path.join(self.directory, name))
+            files.append((st.st_mtime, name[:-5], st.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    value = json.load(f)
+                os.utime(path)
+            except (OSError, ValueError):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        data = json.dumps(value, default=str).encode("utf-8")
+        with self._lock:
+            path = self._path(key)
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self._entries[key] = len(data)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        total = sum(self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "used_mb": round(sum(self._entries.values()) / (1024 * 1024), 2),
+                "budget_mb": round(self.max_bytes / (1024 * 1024), 2),
+            }
+
+
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB * 1024 * 1024)
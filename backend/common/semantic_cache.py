@@ -0,0 +1,158 @@
+import logging
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+SEMANTIC_CACHE_ENABLED = os.environ.get("STUDYBUDDY_SEMANTIC_CACHE", "0") == "1"
+# Cosine similarity a new question needs with a cached one to reuse its answer
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("STUDYBUDDY_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.environ.get("STUDYBUDDY_SEMANTIC_CACHE_SIZE", "1000"))
+SEMANTIC_CACHE_NEIGHBOURS = 4
+# Lookups whose best candidate score is kept for /api/metrics
+SEMANTIC_CACHE_RECENT = 50
+
+
+# =====================================================
+# SEMANTIC ANSWER CACHE
+# =====================================================
+
+class SemanticAnswerCache:
+    """
+    Reuses an LLM answer for a paraphrased question: the question
+    embeddings must be within `threshold` cosine similarity AND both
+    questions must retrieve the same set of context chunks.
+    """
+
+    def __init__(self, dim: int, threshold: float, max_entries: int, enabled: bool = True):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Misses where a same-context candidate scored below the threshold /
+        # a candidate above the threshold had different context; with
+        # `recent` these are what the threshold is tuned from
+        self.near_miss_score = 0
+        self.near_miss_context = 0
+        self.recent = deque(maxlen=SEMANTIC_CACHE_RECENT)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32).reshape(1, -1).copy()
+        faiss.normalize_L2(v)
+        return v
+
+    def lookup(self, vector, namespace: str, context_ids: List[int], model: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        query = self._normalize(vector)
+        context = frozenset(context_ids)
+
+        with self._lock:
+            if self.index.ntotal == 0:
+                self.misses += 1
+                return None
+
+            scores, ids = self.index.search(query, min(SEMANTIC_CACHE_NEIGHBOURS, self.index.ntotal))
+            best = None
+            best_score = None
+            best_matches = False
+            context_only = similar_only = False
+            for score, entry_id in zip(scores[0], ids[0]):
+                entry = self._entries.get(int(entry_id))
+                if entry is None:
+                    continue
+                matches = (
+                    entry["namespace"] == namespace
+                    and entry["model"] == model
+                    and entry["context"] == context
+                )
+                logger.debug(
+                    "semantic cache candidate score=%.4f context_match=%s threshold=%.2f",
+                    score, matches, self.threshold,
+                )
+                if best_score is None:
+                    best_score, best_matches = float(score), matches
+                if matches and score >= self.threshold:
+                    best = int(entry_id)
+                    break
+                if matches:
+                    context_only = True
+                elif score >= self.threshold:
+                    similar_only = True
+
+            if best_score is not None:
+                self.recent.append({
+                    "score": round(best_score, 4),
+                    "context_match": best_matches,
+                    "hit": best is not None,
+                })
+
+            if best is None:
+                self.near_miss_score += context_only
+                self.near_miss_context += similar_only
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return self._entries[best]["answer"]
+
+    def add(self, vector, namespace: str, context_ids: List[int], model: str, answer: str):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(self._normalize(vector), np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = {
+                "namespace": namespace,
+                "model": model,
+                "context": frozenset(context_ids),
+                "answer": answer,
+            }
+
+            while len(self._entries) > self.max_entries:
+                old_id, _ = self._entries.popitem(last=False)
+                self.index.remove_ids(np.array([old_id], dtype=np.int64))
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "near_miss_score": self.near_miss_score,
+                "near_miss_context": self.near_miss_context,
+                "recent": list(self.recent),
+            }
+
+
+semantic_cache = SemanticAnswerCache(
+    384, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE, enabled=SEMANTIC_CACHE_ENABLED
+)
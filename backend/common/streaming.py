@@ -0,0 +1,80 @@
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# SSE HELPERS
+# =====================================================
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# =====================================================
+# STREAMED ANSWERS
+# =====================================================
+
+_lock = threading.Lock()
+stream_totals = {"streams": 0, "ttft_ms": 0.0, "total_ms": 0.0}
+
+
+def answer_events(
+    llm,
+    prompt: Optional[str],
+    metadata: Dict,
+    answer: Optional[str] = None,
+    on_complete: Optional[Callable[[str], None]] = None,
+) -> Iterator[Tuple[str, object]]:
+    """
+    Yield (event, data) pairs: "metadata" first, then one "token" per
+    generated chunk, then "done" with time-to-first-token and total
+    latency. If `answer` is given (cache hit, no data) it is sent as a
+    single token without calling the LLM.
+    """
+    start = time.perf_counter()
+    yield "metadata", metadata
+
+    ttft = None
+    if answer is None:
+        parts = []
+        for chunk in llm.stream(prompt):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            chunk = chunk if isinstance(chunk, str) else str(chunk)
+            parts.append(chunk)
+            yield "token", chunk
+        answer = "".join(parts)
+        if on_complete:
+            on_complete(answer)
+    else:
+        ttft = time.perf_counter() - start
+        yield "token", answer
+
+    total = time.perf_counter() - start
+    timings = {
+        "ttft_ms": round((ttft if ttft is not None else total) * 1000, 1),
+        "total_ms": round(total * 1000, 1),
+    }
+    logger.info("streamed answer: %s", timings)
+
+    with _lock:
+        stream_totals["streams"] += 1
+        stream_totals["ttft_ms"] += timings["ttft_ms"]
+        stream_totals["total_ms"] += timings["total_ms"]
+
+    yield "done", timings
+
+
+def streaming_stats() -> Dict:
+    with _lock:
+        n = stream_totals["streams"]
+        return {
+            "streams": n,
+            "avg_ttft_ms": round(stream_totals["ttft_ms"] / n, 1) if n else 0.0,
+            "avg_total_ms": round(stream_totals["total_ms"] / n, 1) if n else 0.0,
+        }
@@ -0,0 +1,370 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+
+from common import index_manager
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+INDEX_DIR = os.environ.get(
+    "STUDYBUDDY_INDEX_DIR",
+    os.path.join(os.path.expanduser("~"), ".studybuddy", "indexes"),
+)
+
+
+# Values per "IN (?, ...)" query; older SQLite builds allow only 999
+# variables per statement
+SQLITE_IN_BATCH = 500
+
+
+def in_batches(values: List) -> Iterator[Tuple[List, str]]:
+    """
+    (batch, placeholders) for each SQLITE_IN_BATCH-sized slice of `values`.
+    """
+    for i in range(0, len(values), SQLITE_IN_BATCH):
+        batch = values[i:i + SQLITE_IN_BATCH]
+        yield batch, ",".join("?" * len(batch))
+
+
+# =====================================================
+# CHUNK METADATA (SQLite, row id == FAISS vector id)
+# =====================================================
+
+class ChunkStore:
+    """
+    Chunk records on disk, looked up by vector id so only the
+    retrieved rows are ever loaded into memory.
+    """
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id INTEGER PRIMARY KEY, doc_id TEXT, hash TEXT, data TEXT NOT NULL)"
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(chunks)")}
+        if "hash" not in columns:
+            self.conn.execute("ALTER TABLE chunks ADD COLUMN hash TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_hash ON chunks (hash)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY)")
+        self.conn.commit()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def extend(
+        self,
+        start_id: int,
+        records: List[Dict],
+        doc_id: Optional[str] = None,
+        hashes: Optional[List[str]] = None,
+    ):
+        hashes = hashes or [None] * len(records)
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO chunks (id, doc_id, hash, data) VALUES (?, ?, ?, ?)",
+            [(start_id + i, doc_id, h, json.dumps(r)) for i, (r, h) in enumerate(zip(records, hashes))],
+        )
+        self.conn.commit()
+
+    def get(self, ids: List[int]) -> Dict[int, Dict]:
+        rows = []
+        for batch, placeholders in in_batches(ids):
+            rows += self.conn.execute(
+                f"SELECT id, doc_id, data FROM chunks WHERE id IN ({placeholders})", batch
+            ).fetchall()
+        return {
+            row_id: dict(json.loads(data), id=row_id, doc_id=doc_id)
+            for row_id, doc_id, data in rows
+        }
+
+    def existing_hashes(self, hashes: List[str]) -> Set[str]:
+        found = set()
+        for batch, placeholders in in_batches(hashes):
+            found.update(row[0] for row in self.conn.execute(
+                f"SELECT DISTINCT hash FROM chunks WHERE hash IN ({placeholders})", batch
+            ))
+        return found
+
+    def add_doc(self, doc_id: str):
+        self.conn.execute("INSERT OR IGNORE INTO docs (doc_id) VALUES (?)", (doc_id,))
+        self.conn.commit()
+
+    def has_doc(self, doc_id: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM docs WHERE doc_id = ? LIMIT 1", (doc_id,)
+        ).fetchone() is not None
+
+    def truncate(self, n: int):
+        self.conn.execute("DELETE FROM chunks WHERE id >= ?", (n,))
+        self.conn.commit()
+
+
+# =====================================================
+# PERSISTENT FAISS INDEX
+# =====================================================
+
+def _is_mapped(index) -> bool:
+    """
+    Whether the bulk of the index data is backed by the file rather than
+    RAM: IVF inverted lists (IO_FLAG_MMAP) or flat/HNSW codes
+    (IO_FLAG_MMAP_IFC).
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        invlists = faiss.downcast_InvertedLists(index.invlists)
+        return isinstance(invlists, faiss.OnDiskInvertedLists)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    codes = getattr(index, "codes", None)
+    # MaybeOwnedVector (FAISS >= 1.9) doesn't own mapped storage
+    return codes is not None and getattr(codes, "is_owner", True) is False
+
+
+def read_index_mmap(path: str) -> Tuple["faiss.Index", bool]:
+    """
+    Open an index memory-mapped and read-only if this FAISS build
+    supports it for the index type, otherwise read it normally. The flag
+    is True only if the data was actually mapped.
+    """
+    with open(path, "rb") as f:
+        fourcc = f.read(4)
+    # IVF fourccs start "Iw" ("IvF" in old files); their lists map with
+    # IO_FLAG_MMAP, everything else needs IO_FLAG_MMAP_IFC
+    if fourcc[:2] in (b"Iw", b"Iv"):
+        flags = getattr(faiss, "IO_FLAG_MMAP", 0)
+    else:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    if flags:
+        try:
+            index = faiss.read_index(path, flags | getattr(faiss, "IO_FLAG_READ_ONLY", 0))
+            return index, _is_mapped(index)
+        except RuntimeError:
+            pass
+    return faiss.read_index(path), False
+
+
+class VectorIndex:
+    """
+    A FAISS index plus its chunk metadata, stored under INDEX_DIR/<name>/.
+    Metadata is written as it is added; call snapshot() after an ingest
+    to persist the vectors. The index starts flat and is migrated in the
+    background as the corpus grows (see common.index_manager).
+
+    With quantized storage, full-precision vectors are also appended to
+    vectors.f32 on disk; they are memory-mapped for exact re-ranking and
+    lossless rebuilds, and never held in RAM.
+
+    Opening an index never modifies it on disk; the serving process calls
+    recover() once at startup to roll back writes made after the last
+    snapshot.
+    """
+
+    def __init__(self, name: str, dim: int, directory: str = INDEX_DIR, storage: str = None):
+        self.name = name
+        self.dim = dim
+        self.storage = storage or index_manager.VECTOR_STORAGE
+        self.lock = threading.RLock()
+        self.path = os.path.join(directory, name)
+        os.makedirs(self.path, exist_ok=True)
+
+        self.index_file = os.path.join(self.path, "index.faiss")
+        self.raw_file = os.path.join(self.path, "vectors.f32")
+        self.chunks = ChunkStore(os.path.join(self.path, "chunks.db"))
+        self._mmapped = False
+        self._dirty = False
+        self._migrating = False
+        # Bumped whenever vectors are added, for cache invalidation
+        self.version = 0
+
+        if os.path.exists(self.index_file):
+            self.index, self._mmapped = read_index_mmap(self.index_file)
+            index_manager.apply_search_params(self.index)
+        else:
+            self.index = faiss.IndexFlatL2(dim)
+
+        self._raw_ok = self.storage != "float32" and self._raw_size() == self._raw_expected()
+
+    def recover(self):
+        """
+        Drop chunk metadata and raw vectors written after the last
+        successful snapshot. Only the serving process may call this, at
+        startup: any other process opening the same index (pool workers,
+        benchmarks) would delete rows of an ingest still in progress.
+        """
+        with self.lock:
+            self.chunks.truncate(self.index.ntotal)
+            self._raw_ok = self._init_raw_vectors()
+
+    def _raw_size(self) -> int:
+        return os.path.getsize(self.raw_file) if os.path.exists(self.raw_file) else 0
+
+    def _raw_expected(self) -> int:
+        return self.index.ntotal * self.dim * 4
+
+    def _init_raw_vectors(self) -> bool:
+        if self.storage == "float32":
+            return False
+
+        expected = self._raw_expected()
+        size = self._raw_size()
+
+        if size > expected:
+            with open(self.raw_file, "r+b") as f:
+                f.truncate(expected)
+        elif size < expected:
+            # Only a float32 index can backfill the file losslessly
+            if index_manager.index_storage(self.index) != "float32":
+                return False
+            with open(self.raw_file, "wb") as f:
+                f.write(index_manager.read_vectors(self.index).tobytes())
+        return True
+
+    def _raw_vectors(self) -> np.ndarray:
+        return np.memmap(self.raw_file, dtype=np.float32, mode="r", shape=(self.index.ntotal, self.dim))
+
+    def _read_vectors(self, start: int, n: int) -> np.ndarray:
+        if self._raw_ok:
+            return np.array(self._raw_vectors()[start:start + n])
+        return index_manager.read_vectors(self.index, start, n)
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def _writable(self):
+        # A memory-mapped index is read-only; load it fully on first write
+        if self._mmapped:
+            self.index = index_manager.apply_search_params(faiss.read_index(self.index_file))
+            self._mmapped = False
+
+    def add(
+        self,
+        vectors: np.ndarray,
+        records: List[Dict],
+        doc_id: Optional[str] = None,
+        hashes: Optional[List[str]] = None,
+    ):
+        with self.lock:
+            self._writable()
+            start = self.index.ntotal
+            self.index.add(vectors)
+            self.chunks.extend(start, records, doc_id, hashes)
+            if self._raw_ok:
+                with open(self.raw_file, "ab") as f:
+                    f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            self._dirty = True
+            self.version += 1
+
+            if not self._migrating and index_manager.needs_rebuild(self.index, self.storage):
+                self._migrating = True
+                threading.Thread(target=self._migrate, daemon=True).start()
+
+    def _migrate(self):
+        """
+        Rebuild into the index kind the corpus size calls for. The new
+        index is built off-lock; vectors added meanwhile are copied over
+        before the swap.
+        """
+        try:
+            with self.lock:
+                kind = index_manager.target_kind(self.index)
+                storage = index_manager.target_storage(self.index, self.storage)
+                n = self.index.ntotal
+                vectors = self._read_vectors(0, n)
+
+            new_index = index_manager.build_index(kind, vectors, self.dim, storage)
+
+            with self.lock:
+                extra = self.index.ntotal - n
+                if extra:
+                    new_index.add(self._read_vectors(n, extra))
+                self.index = new_index
+                self._dirty = True
+            self.snapshot()
+        finally:
+            self._migrating = False
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[Dict, float]]:
+        """
+        Returns [(record, distance)] for the k nearest chunks; each record
+        carries its vector id under "id".
+        """
+        with self.lock:
+            if self.index.ntotal == 0:
+                return []
+
+            factor = index_manager.RERANK_FACTOR
+            if factor and self._raw_ok and index_manager.index_storage(self.index) != "float32":
+                _, candidates = self.index.search(query, min(k * factor, self.index.ntotal))
+                D, I = index_manager.rerank(query[0], candidates[0], self._raw_vectors(), k)
+            else:
+                D, I = self.index.search(query, min(k, self.index.ntotal))
+
+            ids = [int(i) for i in I[0] if i >= 0]
+            records = self.chunks.get(ids)
+
+        return [
+            (records[int(i)], float(d))
+            for d, i in zip(D[0], I[0])
+            if int(i) in records
+        ]
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "kind": index_manager.index_kind(self.index),
+                "storage": index_manager.index_storage(self.index),
+                "ntotal": self.index.ntotal,
+                "bytes_per_vector": self.bytes_per_vector(),
+                "mmapped": self._mmapped,
+                "migrating": self._migrating,
+            }
+
+    def bytes_per_vector(self) -> float:
+        """
+        Size of the last snapshot per vector (codes plus index overhead).
+        """
+        if not self.index.ntotal or not os.path.exists(self.index_file):
+            return 0.0
+        return round(os.path.getsize(self.index_file) / self.index.ntotal, 1)
+
+    def new_hashes(self, hashes: List[str]) -> List[str]:
+        """
+        Filter chunk hashes down to those not yet in the index (and not
+        repeated earlier in `hashes`), preserving order.
+        """
+        with self.lock:
+            seen = self.chunks.existing_hashes(list(set(hashes)))
+        fresh = []
+        for h in hashes:
+            if h not in seen:
+                seen.add(h)
+                fresh.append(h)
+        return fresh
+
+    def mark_doc(self, doc_id: str):
+        with self.lock:
+            self.chunks.add_doc(doc_id)
+
+    def has_doc(self, doc_id: str) -> bool:
+        with self.lock:
+            return self.chunks.has_doc(doc_id)
+
+    def snapshot(self):
+        with self.lock:
+            if not self._dirty:
+                return
+            tmp = f"{self.index_file}.tmp"
+            faiss.write_index(self.index, tmp)
+            os.replace(tmp, self.index_file)
+            self._dirty = False
@@ -1,82 +1,204 @@
-import faiss
-import numpy as np
-import PyPDF2
-
-from langchain_ollama import OllamaLLM
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_text_splitters import CharacterTextSplitter
 
+from common.embedding_cache import chunk_hash
+from common.context_packing import find_offsets
+from common.embedding_service import get_embeddings
+from common.llm_gateway import BACKGROUND, get_llm
+from common.rag import RAGAnswerer, add_chunks
+from common.vector_index import VectorIndex
+from q_and_a_bot.pdf_pages import count_pages, iter_pages, slowest_pages
+
 # -----------------------------
 # Global setup (UNCHANGED)
 # -----------------------------
 
+LLM_MODEL_NAME = "mistral"  # you can change to llama3 if needed
+EMBED_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+
 # Load AI Model (Ollama must be running)
-llm = OllamaLLM(model="mistral")  # you can change to llama3 if needed
+llm = get_llm(LLM_MODEL_NAME)
+# Upload-time summaries queue behind interactive questions
+summary_llm = get_llm(LLM_MODEL_NAME, priority=BACKGROUND)
 
-# Load Hugging Face Embeddings
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+# Shared Hugging Face embeddings (loaded on first use)
+embeddings = get_embeddings(EMBED_MODEL_NAME)
 
-# FAISS Index (L2 distance, dim=384)
+# FAISS Index (L2 distance, dim=384) + chunk metadata, persisted on disk.
+# Its lock lets questions run while a PDF is ingesting.
 EMBED_DIM = 384
-index = faiss.IndexFlatL2(EMBED_DIM)
+store = VectorIndex("pdf", EMBED_DIM)
+
+rag = RAGAnswerer(
+    store, embeddings, llm, LLM_MODEL_NAME,
+    prompt=(
+        "Based on the following document context, answer the user's question.\n\n"
+        "Context:\n{context}\n\n"
+        "Question: {query}\n\n"
+        "Answer clearly and concisely:"
+    ),
+    source_field="filename",
+    k=3,
+    empty_message="No documents are stored yet. Please upload a PDF first.",
+    no_hits_message="No relevant data found in stored documents.",
+)
 
-# Store chunks aligned with FAISS
-chunk_store = []
+# Streaming ingest: split this much buffered page text at a time and
+# embed/index this many chunks per batch
+STREAM_SPLIT_CHARS = 8 * CHUNK_SIZE
+EMBED_BATCH_SIZE = 64
+SUMMARY_INPUT_CHARS = 3000
+
+# doc key -> {"file", "status", "total_pages", "pages", "chunks"}
+ingest_progress = {}
 
 # Store latest summary
 summary_text = ""
 
+# Everything that changes the result of upload_pdf_and_process
+PIPELINE_PARAMS = {
+    "pipeline": "pdf",
+    "llm": LLM_MODEL_NAME,
+    "embedding_model": EMBED_MODEL_NAME,
+    "chunk_size": CHUNK_SIZE,
+    "chunk_overlap": CHUNK_OVERLAP,
+}
+
 # -----------------------------
 # Helper functions (LOGIC UNCHANGED)
 # -----------------------------
 
-def extract_text_from_pdf(file_path: str) -> str:
+def extract_text_from_pdf(file_path: str, timings: list = None) -> str:
     """
     Extract text from a PDF file path
     """
-    with open(file_path, "rb") as f:
-        pdf_reader = PyPDF2.PdfReader(f)
-        text = ""
-        for page in pdf_reader.pages:
-            page_text = page.extract_text() or ""
-            text += page_text + "\n"
-    return text
+    return "".join(f"{text}\n" for _, text in iter_pages(file_path, timings=timings))
 
 
 def store_in_faiss(text: str, filename: str) -> str:
-    global index, chunk_store
-
-    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+    splitter = CharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
     chunks = splitter.split_text(text)
 
     if not chunks:
         return "No text chunks were created from this document."
 
-    vectors = embeddings.embed_documents(chunks)
-    vectors = np.array(vectors, dtype=np.float32)
+    try:
+        added, duplicates, _ = add_chunks(
+            store, embeddings, chunks, {"filename": filename},
+            doc_id=chunk_hash(text), offsets=find_offsets(text, chunks),
+        )
+    except ValueError as e:
+        return str(e)
+    store.snapshot()
 
-    if vectors.shape[1] != EMBED_DIM:
-        return f"Embedding dimension mismatch: expected {EMBED_DIM}, got {vectors.shape[1]}"
+    return f"Document stored successfully ({added} chunks added, {duplicates} duplicates skipped)"
 
-    index.add(vectors)
 
-    for chunk in chunks:
-        chunk_store.append({
-            "filename": filename,
-            "text": chunk
-        })
+def iter_chunks(texts, splitter):
+    """
+    Chunk a stream of page texts, splitting a bounded buffer at a time.
+    Yields (chunk, start) with start the chunk's offset in the document
+    (None if the splitter altered its whitespace). The buffer tail from
+    the last chunk of each split is carried over so chunks still span
+    page boundaries.
+    """
+    buffer = ""
+    base = 0  # document offset of buffer[0]
+
+    def emit(chunks, offsets):
+        for chunk, off in zip(chunks, offsets):
+            yield chunk, (base + off if off is not None else None)
+
+    for text in texts:
+        buffer += text + "\n"
+        if len(buffer) < STREAM_SPLIT_CHARS:
+            continue
+
+        chunks = splitter.split_text(buffer)
+        offsets = find_offsets(buffer, chunks)
+        if len(chunks) > 1 and offsets[-1] is not None:
+            yield from emit(chunks[:-1], offsets[:-1])
+            base += offsets[-1]
+            buffer = buffer[offsets[-1]:]
+        else:
+            yield from emit(chunks, offsets)
+            base += len(buffer)
+            buffer = ""
+
+    if buffer.strip():
+        chunks = splitter.split_text(buffer)
+        yield from emit(chunks, find_offsets(buffer, chunks))
+
+
+def ingest_pdf(file_path: str, doc_key: str, timings: list = None, doc_id: str = None):
+    """
+    page generator -> chunker -> micro-batched embedder -> index.add
 
-    return f"Document stored successfully ({len(chunks)} chunks added)"
+    Chunks become searchable batch by batch. Returns (progress, head_text)
+    where head_text is the start of the document, used for the summary.
+    """
+    progress = ingest_progress[doc_key] = {
+        "file": file_path,
+        "status": "running",
+        "total_pages": count_pages(file_path),
+        "pages": 0,
+        "chunks": 0,
+        "duplicates": 0,
+        "embed_cache_hits": 0,
+    }
+
+    def flush(batch):
+        chunks = [chunk for chunk, _ in batch]
+        offsets = [start for _, start in batch]
+        added, duplicates, cache_hits = add_chunks(
+            store, embeddings, chunks, {"filename": file_path}, doc_id, offsets
+        )
+        progress["chunks"] += added
+        progress["duplicates"] += duplicates
+        progress["embed_cache_hits"] += cache_hits
+
+    head = []
+    head_len = 0
+
+    def pages():
+        nonlocal head_len
+        for _, text in iter_pages(file_path, timings=timings):
+            progress["pages"] += 1
+            if head_len < SUMMARY_INPUT_CHARS:
+                head.append(text + "\n")
+                head_len += len(text) + 1
+            yield text
+
+    splitter = CharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    batch = []
+    try:
+        for item in iter_chunks(pages(), splitter):
+            batch.append(item)
+            if len(batch) >= EMBED_BATCH_SIZE:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    except Exception:
+        progress["status"] = "error"
+        raise
+    finally:
+        store.snapshot()
+
+    if doc_id and progress["chunks"] + progress["duplicates"]:
+        store.mark_doc(doc_id)
+
+    progress["status"] = "done"
+    return dict(progress), "".join(head)
 
 
 def generate_summary(text: str) -> str:
     global summary_text
 
-    input_text = text[:3000]
+    input_text = text[:SUMMARY_INPUT_CHARS]
 
-    summary = llm.invoke(
+    summary = summary_llm.invoke(
         f"Summarize the following document in a concise and clear way:\n\n{input_text}"
     )
 
@@ -84,65 +206,67 @@ def generate_summary(text: str) -> str:
     return summary_text
 
 
-def retrieve_and_answer(query: str) -> str:
-    global index, chunk_store
-
-    if index.ntotal == 0 or not chunk_store:
-        return "No documents are stored yet. Please upload a PDF first."
-
-    query_vector = embeddings.embed_query(query)
-    query_vector = np.array(query_vector, dtype=np.float32).reshape(1, -1)
-
-    D, I = index.search(query_vector, k=3)
-
-    context_parts = []
-    for idx in I[0]:
-        if 0 <= idx < len(chunk_store):
-            context_parts.append(chunk_store[idx]["text"])
-
-    if not context_parts:
-        return "No relevant data found in stored documents."
-
-    context = "\n\n".join(context_parts)
-
-    answer = llm.invoke(
-        f"Based on the following document context, answer the user's question.\n\n"
-        f"Context:\n{context}\n\n"
-        f"Question: {query}\n\n"
-        f"Answer clearly and concisely:"
-    )
-
-    return answer if isinstance(answer, str) else str(answer)
-
-
 # -----------------------------
 # PUBLIC API FUNCTIONS (FOR FLASK)
 # -----------------------------
 
-def upload_pdf_and_process(file_path: str):
+def upload_pdf_and_process(file_path: str, doc_id: str = None):
     """
     Call this once when a PDF is uploaded
     """
-    text = extract_text_from_pdf(file_path)
+    page_timings = []
+    try:
+        progress, head_text = ingest_pdf(
+            file_path, doc_id or file_path, timings=page_timings, doc_id=doc_id
+        )
+    except ValueError as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }
 
-    if not text.strip():
+    if not progress["chunks"] + progress["duplicates"]:
         return {
             "status": "error",
             "message": "PDF contains no extractable text"
         }
 
-    store_msg = store_in_faiss(text, file_path)
-    summary = generate_summary(text)
+    store_msg = (
+        f"Document stored successfully ({progress['chunks']} chunks added, "
+        f"{progress['duplicates']} duplicates skipped, "
+        f"{progress['embed_cache_hits']} embeddings reused from cache)"
+    )
+    summary = generate_summary(head_text)
 
     return {
         "status": "success",
         "store_message": store_msg,
-        "summary": summary
+        "summary": summary,
+        "extraction": {
+            "pages": len(page_timings),
+            "seconds": round(sum(t["seconds"] for t in page_timings), 3),
+            "slowest_pages": slowest_pages(page_timings),
+        },
     }
 
 
+def get_ingest_progress() -> dict:
+    return {key: dict(p) for key, p in ingest_progress.items()}
+
+
+def is_document_indexed(doc_id: str) -> bool:
+    return store.has_doc(doc_id)
+
+
 def ask_question(question: str) -> str:
     """
     Call this for Q&A
     """
-    return retrieve_and_answer(question)
+    return rag.answer(question)
+
+
+def ask_question_stream(question: str):
+    """
+    Call this for streamed (SSE) Q&A
+    """
+    return rag.stream(question)
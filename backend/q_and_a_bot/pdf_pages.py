@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import PyPDF2
+
+# Kept free of model imports: a spawned pool worker imports only this
+# module and app.py's module level (the AI modules load in create_app)
+
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+# PDFs with fewer pages are extracted in-process
+PARALLEL_MIN_PAGES = 64
+PAGES_PER_TASK = 16
+PDF_POOL_WORKERS = int(os.environ.get(
+    "STUDYBUDDY_PDF_WORKERS", str(max(1, (os.cpu_count() or 1) - 1))
+))
+
+
+# =====================================================
+# PAGE EXTRACTION
+# =====================================================
+
+def count_pages(file_path: str) -> int:
+    with open(file_path, "rb") as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def iter_page_range(
+    file_path: str, start: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[int, str, float]]:
+    """
+    Lazily yield (page_number, text, seconds) for pages [start, end).
+    """
+    with open(file_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        end = len(reader.pages) if end is None else min(end, len(reader.pages))
+        for i in range(start, end):
+            t0 = time.perf_counter()
+            text = reader.pages[i].extract_text() or ""
+            yield i + 1, text, time.perf_counter() - t0
+
+
+def _extract_range(args) -> List[Tuple[int, str, float]]:
+    file_path, start, end = args
+    return list(iter_page_range(file_path, start, end))
+
+
+# =====================================================
+# SHARED WORKER POOL
+# =====================================================
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    One process pool for the whole server, created on first use. Workers
+    are spawned, not forked, since the server process has threads.
+    """
+    global _pdf_pool
+
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=PDF_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pdf_pool
+
+
+def _iter_parallel(ranges: list, workers: int) -> Iterator[List[Tuple[int, str, float]]]:
+    # At most `workers` ranges in flight per call, yielded in page order
+    pool = get_pdf_pool()
+    todo = iter(ranges)
+    pending = deque()
+    try:
+        while True:
+            while len(pending) < workers:
+                r = next(todo, None)
+                if r is None:
+                    break
+                pending.append(pool.submit(_extract_range, r))
+            if not pending:
+                return
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_pages(
+    file_path: str, workers: Optional[int] = None, timings: Optional[list] = None
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) in page order. Large PDFs are split into
+    page ranges and extracted across a process pool.
+    Per-page {"page", "seconds"} entries are appended to `timings`.
+    """
+    total = count_pages(file_path)
+    workers = min(workers or PDF_POOL_WORKERS, PDF_POOL_WORKERS)
+
+    if total < PARALLEL_MIN_PAGES or workers == 1:
+        parts = [iter_page_range(file_path)]
+    else:
+        ranges = [
+            (file_path, s, min(s + PAGES_PER_TASK, total))
+            for s in range(0, total, PAGES_PER_TASK)
+        ]
+        parts = _iter_parallel(ranges, workers)
+
+    try:
+        for part in parts:
+            for page_no, text, seconds in part:
+                if timings is not None:
+                    timings.append({"page": page_no, "seconds": round(seconds, 4)})
+                yield page_no, text
+    finally:
+        if hasattr(parts, "close"):
+            parts.close()
+
+
+def slowest_pages(timings: list, n: int = 5) -> list:
+    return sorted(timings, key=lambda t: t["seconds"], reverse=True)[:n]
@@ -46,6 +46,101 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     });
 
+    // Live feedback: after each pause in typing, send only the changed
+    // byte range; the server re-checks just the edited region.
+    const codeInput = document.getElementById("codeInput");
+    const languageSelect = document.getElementById("languageSelect");
+    const encoder = new TextEncoder();
+    const docId = Math.random().toString(36).slice(2);
+    let lastSent = null;
+    let lastLanguage = null;
+    let liveTimer = null;
+    let liveBusy = false;
+
+    function diffEdit(before, after) {
+        let start = 0;
+        const maxStart = Math.min(before.length, after.length);
+        while (start < maxStart && before[start] === after[start]) start++;
+
+        let endBefore = before.length;
+        let endAfter = after.length;
+        while (endBefore > start && endAfter > start && before[endBefore - 1] === after[endAfter - 1]) {
+            endBefore--;
+            endAfter--;
+        }
+
+        // Never cut between the halves of a surrogate pair: the encoder
+        // would turn a lone half into U+FFFD and the byte offsets drift
+        const isLow = (str, i) => i > 0 && i < str.length && (str.charCodeAt(i) & 0xFC00) === 0xDC00;
+        if (isLow(before, start) || isLow(after, start)) start--;
+        if (isLow(before, endBefore) || isLow(after, endAfter)) {
+            endBefore++;
+            endAfter++;
+        }
+
+        const startByte = encoder.encode(before.slice(0, start)).length;
+        return {
+            start: startByte,
+            end: startByte + encoder.encode(before.slice(start, endBefore)).length,
+            text: after.slice(start, endAfter)
+        };
+    }
+
+    async function liveAnalyze() {
+        const code = codeInput.value;
+        const language = languageSelect.value;
+        if (language === "python" || !code.trim() || liveBusy || code === lastSent) return;
+
+        const payload = { doc_id: docId, language };
+        if (lastSent === null || language !== lastLanguage) {
+            payload.code = code;
+        } else {
+            payload.edits = [diffEdit(lastSent, code)];
+        }
+
+        liveBusy = true;
+        try {
+            const res = await fetch("/analyze-code/incremental", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify(payload)
+            });
+            const data = await res.json();
+
+            if (data.resync) {
+                lastSent = null;
+            } else if (data.error) {
+                // don't retry until the user edits again; then resend in full
+                lastSent = code;
+                lastLanguage = null;
+            } else {
+                lastSent = code;
+                lastLanguage = language;
+                outputBox.innerHTML = "";
+                renderExplanation(data.explanation);
+                renderSuggestions(data.suggestions);
+            }
+        } catch (err) {
+            console.error(err);
+        } finally {
+            liveBusy = false;
+            if (codeInput.value !== lastSent) scheduleLive();
+        }
+    }
+
+    function scheduleLive() {
+        clearTimeout(liveTimer);
+        liveTimer = setTimeout(liveAnalyze, 150);
+    }
+
+    if (codeInput && languageSelect) {
+        codeInput.addEventListener("input", scheduleLive);
+        languageSelect.addEventListener("change", () => {
+            lastSent = null;
+            scheduleLive();
+        });
+    }
+
     function renderExplanation(text) {
         if (!text) return;
 
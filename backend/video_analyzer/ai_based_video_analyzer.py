@@ -1,13 +1,25 @@
+import hashlib
 import os
 import tempfile
 import shutil
 import subprocess
-from typing import List, Tuple
+import time
+import threading
+import wave
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
 
 from PIL import Image
 import numpy as np
 import torch
 
+from common.conversation_memory import SessionMemoryStore
+from common.llm_gateway import BACKGROUND, get_llm
+from common.model_pool import model_pool
+
 # Whisper for local transcription
 try:
     import whisper
@@ -25,11 +37,9 @@ except Exception:
 try:
     from langchain_ollama import OllamaLLM
     from langchain_core.prompts import PromptTemplate
-    from langchain_community.chat_message_histories import ChatMessageHistory
 except Exception:
     OllamaLLM = None
     PromptTemplate = None
-    ChatMessageHistory = None
 
 # OpenCV / imageio
 try:
@@ -46,8 +56,8 @@ except Exception:
 # INITIALIZE MODELS (UNCHANGED)
 # =====================================================
 
-llm = OllamaLLM(model="mistral") if OllamaLLM else None
-chat_history = ChatMessageHistory() if ChatMessageHistory else None
+llm = get_llm("mistral", priority=BACKGROUND) if OllamaLLM else None
+video_memory = SessionMemoryStore(llm) if llm else None
 
 
 # =====================================================
@@ -79,25 +89,207 @@ def extract_audio_ffmpeg(video_path: str, out_audio_path: str, sample_rate: int
     return out_audio_path
 
 
-def sample_frames_opencv(video_path: str, fps: float) -> List[Tuple[float, Image.Image]]:
+# Inputs longer than this (seconds) are transcribed from a temp WAV file
+# instead of an in-memory buffer (~230 MB of float32 per hour at 16 kHz)
+IN_MEMORY_AUDIO_MAX_SECONDS = 3600
+
+PCM_CHUNK_SAMPLES = 1 << 16
+
+
+def probe_duration(video_path: str) -> Optional[float]:
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        try:
+            out = subprocess.run(
+                [ffprobe, "-v", "error", "-show_entries", "format=duration",
+                 "-of", "default=noprint_wrappers=1:nokey=1", video_path],
+                check=True, capture_output=True, text=True,
+            ).stdout.strip()
+            return float(out)
+        except (subprocess.CalledProcessError, ValueError):
+            pass
+
+    if cv2:
+        cap = cv2.VideoCapture(video_path)
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+        if frames and fps:
+            return frames / fps
+
+    return None
+
+
+def extract_audio_pcm(
+    video_path: str, sample_rate: int = 16000, expected_seconds: Optional[float] = None
+) -> np.ndarray:
+    """
+    Decode mono s16le PCM from ffmpeg's stdout straight into a preallocated
+    float32 array in [-1, 1], ready to hand to Whisper.
+    """
+    ffmpeg_exe = find_ffmpeg()
+    cmd = [
+        ffmpeg_exe, "-nostdin", "-i", video_path, "-vn",
+        "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"
+    ]
+
+    capacity = int((expected_seconds or 60) * sample_rate) + sample_rate
+    audio = np.empty(capacity, dtype=np.float32)
+    scratch = np.empty(PCM_CHUNK_SAMPLES, dtype=np.int16)
+    raw = memoryview(scratch).cast("B")
+    scale = np.float32(1.0 / 32768.0)
+    filled = 0
+    carry = 0  # odd trailing byte from the previous read
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            n = proc.stdout.readinto(raw[carry:])
+            if not n:
+                break
+            nbytes = carry + n
+            samples = nbytes // 2
+
+            if filled + samples > audio.shape[0]:
+                grown = np.empty(max(audio.shape[0] * 2, filled + samples), dtype=np.float32)
+                grown[:filled] = audio[:filled]
+                audio = grown
+
+            np.multiply(scratch[:samples], scale, out=audio[filled:filled + samples], casting="unsafe")
+            filled += samples
+
+            carry = nbytes % 2
+            if carry:
+                raw[0] = raw[nbytes - 1]
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+    return audio[:filled]
+
+
+# Gaps larger than this are covered by seeking instead of grab()-ing
+# through every frame (seeking decodes from the previous keyframe)
+SEEK_MIN_GAP_FRAMES = 48
+
+
+def iter_frames_opencv(
+    video_path: str, fps: float, max_frames: Optional[int] = None
+) -> Iterator[Tuple[float, Image.Image]]:
+    """
+    Lazily yield (timestamp, image) at `fps`, seeking straight to each
+    target frame and stopping once `max_frames` have been produced.
+    """
     cap = cv2.VideoCapture(video_path)
-    video_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    frames = []
-    idx = 0
-    interval = max(1, int(video_fps / fps))
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if idx % interval == 0:
-            t = idx / video_fps
+    try:
+        video_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        step = max(1.0, video_fps / fps)
+        pos = 0  # index of the frame the decoder returns next
+        k = 0
+
+        while max_frames is None or k < max_frames:
+            target = int(round(k * step))
+
+            if target - pos > SEEK_MIN_GAP_FRAMES and cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+                pos = target
+
+            ok = True
+            while ok and pos < target:
+                ok = cap.grab()
+                pos += 1
+            if not ok:
+                break
+
+            ok, frame = cap.read()
+            if not ok:
+                break
+            pos += 1
+
             img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            frames.append((round(t, 3), img))
-        idx += 1
+            yield round(target / video_fps, 3), img
+            k += 1
+    finally:
+        cap.release()
+
+
+def sample_frames_opencv(video_path: str, fps: float) -> List[Tuple[float, Image.Image]]:
+    return list(iter_frames_opencv(video_path, fps))
+
+
+# =====================================================
+# KEYFRAME SELECTION
+# =====================================================
+
+# Hamming distance (out of 64 hash bits) above which a frame starts a new scene
+SCENE_CHANGE_THRESHOLD = 10
+
+
+def frame_signature(img: Image.Image) -> int:
+    """
+    64-bit difference hash of a downscaled grayscale frame.
+    """
+    small = np.asarray(img.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def select_keyframes(frames, threshold: int = SCENE_CHANGE_THRESHOLD, stats: Optional[dict] = None):
+    """
+    Collapse runs of near-identical frames into one ((start, end), image)
+    entry per scene. Counts are written to stats["sampled"] / stats["keyframes"].
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("sampled", 0)
+    stats.setdefault("keyframes", 0)
+
+    current = None  # [start, end, signature, image]
+    for t, img in frames:
+        stats["sampled"] += 1
+        sig = frame_signature(img)
+
+        if current is not None and hamming_distance(sig, current[2]) <= threshold:
+            current[1] = t
+            continue
 
-    cap.release()
-    return frames
+        if current is not None:
+            stats["keyframes"] += 1
+            yield (current[0], current[1]), current[3]
+        current = [t, t, sig, img]
+
+    if current is not None:
+        stats["keyframes"] += 1
+        yield (current[0], current[1]), current[3]
+
+
+def format_time_range(start: float, end: float) -> str:
+    if end is None or end <= start:
+        return format_time(start)
+    return f"{format_time(start)}–{format_time(end)}"
+
+
+def load_whisper_model(name: str, device: str):
+    return model_pool.get(
+        ("whisper", name, device),
+        lambda: whisper.load_model(name, device=device),
+    )
+
+
+def load_blip_model(name: str, device: str):
+    def _load():
+        processor = BlipProcessor.from_pretrained(name)
+        model = BlipForConditionalGeneration.from_pretrained(name).to(device)
+        model.eval()
+        return processor, model
+
+    return model_pool.get(("blip", name, device), _load)
 
 
 def caption_image(processor, model, image, device):
@@ -107,11 +299,260 @@ def caption_image(processor, model, image, device):
     return processor.decode(outputs[0], skip_special_tokens=True)
 
 
-def transcribe_audio_whisper(model, audio_path: str) -> dict:
-    return model.transcribe(audio_path)
+def caption_images_batch(processor, model, images, device) -> List[str]:
+    inputs = processor(images=list(images), return_tensors="pt").to(device)
+    with torch.no_grad():
+        outputs = model.generate(**inputs, max_length=32)
+    return processor.batch_decode(outputs, skip_special_tokens=True)
+
+
+def caption_frames(processor, model, frames, device, batch_size: int = 8) -> List[Tuple[float, str]]:
+    """
+    Caption (timestamp, image) pairs with one generate() call per batch.
+    """
+    captions = []
+    batch = []
+    for item in frames:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            texts = caption_images_batch(processor, model, [img for _, img in batch], device)
+            captions.extend((t, c) for (t, _), c in zip(batch, texts))
+            batch = []
+    if batch:
+        texts = caption_images_batch(processor, model, [img for _, img in batch], device)
+        captions.extend((t, c) for (t, _), c in zip(batch, texts))
+    return captions
+
+
+def transcribe_audio_whisper(model, audio) -> dict:
+    """
+    `audio` is a file path or a 16 kHz float32 NumPy array.
+    """
+    return model.transcribe(audio)
+
+
+# =====================================================
+# SILENCE-SKIPPING, SEGMENT-PARALLEL TRANSCRIPTION
+# =====================================================
+
+WHISPER_SAMPLE_RATE = 16000
+VAD_FRAME_MS = 30
+VAD_ENERGY_FLOOR = 0.005      # RMS below this is always silence
+VAD_NOISE_MULTIPLIER = 2.0    # speech must be this much louder than the noise floor
+VAD_MIN_SILENCE_S = 0.6       # shorter pauses stay inside one region
+VAD_PAD_S = 0.2
+VAD_MAX_SEGMENT_S = 30.0      # Whisper's native window
+VAD_MAX_PACK_GAP_S = 2.0      # regions closer than this share one window
+
+# Sized once; a call's parallelism is limited by how its jobs are batched
+VAD_POOL_WORKERS = int(os.environ.get(
+    "STUDYBUDDY_VAD_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))
+))
+
+_vad_pools = {}
+_vad_pools_lock = threading.Lock()
+_worker_whisper_model = None
+
+
+def detect_speech_regions(audio: np.ndarray, sample_rate: int = WHISPER_SAMPLE_RATE) -> List[Tuple[int, int]]:
+    """
+    Energy-based VAD. Returns (start_sample, end_sample) regions of speech,
+    merged across short pauses and packed up to VAD_MAX_SEGMENT_S each.
+    """
+    frame_len = int(sample_rate * VAD_FRAME_MS / 1000)
+    n_frames = len(audio) // frame_len
+    frames = audio[: n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return speech_regions_from_rms(rms, len(audio), sample_rate)
+
+
+def speech_regions_from_rms(
+    rms: np.ndarray, n_samples: int, sample_rate: int = WHISPER_SAMPLE_RATE
+) -> List[Tuple[int, int]]:
+    """
+    detect_speech_regions() given only the per-frame RMS, so audio that
+    doesn't fit in memory can be scanned block by block.
+    """
+    frame_len = int(sample_rate * VAD_FRAME_MS / 1000)
+    if len(rms) == 0:
+        return [(0, n_samples)] if n_samples else []
+
+    threshold = max(VAD_ENERGY_FLOOR, float(np.percentile(rms, 20)) * VAD_NOISE_MULTIPLIER)
+    voiced = rms > threshold
+
+    # Runs of voiced frames -> regions, bridging pauses shorter than VAD_MIN_SILENCE_S
+    max_gap = int(VAD_MIN_SILENCE_S * 1000 / VAD_FRAME_MS)
+    regions = []
+    start = None
+    last = None
+    for i in np.flatnonzero(voiced):
+        if start is None:
+            start = last = i
+        elif i - last > max_gap:
+            regions.append((start, last + 1))
+            start = last = i
+        else:
+            last = i
+    if start is not None:
+        regions.append((start, last + 1))
+
+    pad = int(VAD_PAD_S * sample_rate)
+    max_len = int(VAD_MAX_SEGMENT_S * sample_rate)
+    max_pack_gap = int(VAD_MAX_PACK_GAP_S * sample_rate)
+    segments = []
+    for f_start, f_end in regions:
+        s0 = max(0, f_start * frame_len - pad)
+        s1 = min(n_samples, f_end * frame_len + pad)
+
+        # Whisper pads every call to a 30 s window, so pack close
+        # neighbours into one call instead of paying for each separately
+        if (
+            segments
+            and s0 - segments[-1][1] <= max_pack_gap
+            and s1 - segments[-1][0] <= max_len
+        ):
+            segments[-1] = (segments[-1][0], s1)
+            continue
+
+        while s1 - s0 > max_len:
+            segments.append((s0, s0 + max_len))
+            s0 += max_len
+        segments.append((s0, s1))
+
+    return segments
+
+
+# Long audio is kept in a WAV on disk; VAD frames read per block while scanning it
+WAV_BLOCK_FRAMES = 2048
+
+
+def _read_wav(wav: "wave.Wave_read", n: int) -> np.ndarray:
+    pcm = np.frombuffer(wav.readframes(n), dtype=np.int16)
+    return pcm.astype(np.float32) / 32768.0
+
+
+def _open_pcm_wav(path: str) -> "wave.Wave_read":
+    wav = wave.open(path, "rb")
+    if (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) != (1, 2, WHISPER_SAMPLE_RATE):
+        wav.close()
+        raise wave.Error(f"{path} is not 16 kHz mono 16-bit PCM")
+    return wav
+
+
+def wav_frame_rms(path: str) -> Tuple[np.ndarray, int]:
+    """
+    Per-VAD-frame RMS of a WAV file and its length in samples, reading
+    WAV_BLOCK_FRAMES frames at a time instead of the whole track.
+    """
+    frame_len = int(WHISPER_SAMPLE_RATE * VAD_FRAME_MS / 1000)
+    parts = []
+    with _open_pcm_wav(path) as wav:
+        n_samples = wav.getnframes()
+        for _ in range(n_samples // (frame_len * WAV_BLOCK_FRAMES) + 1):
+            block = _read_wav(wav, frame_len * WAV_BLOCK_FRAMES)
+            n_frames = len(block) // frame_len
+            if n_frames:
+                frames = block[: n_frames * frame_len].reshape(n_frames, frame_len)
+                parts.append(np.sqrt(np.mean(frames * frames, axis=1)))
+    rms = np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+    return rms, n_samples
+
+
+def read_wav_range(path: str, start: int, end: int) -> np.ndarray:
+    with _open_pcm_wav(path) as wav:
+        wav.setpos(start)
+        return _read_wav(wav, end - start)
+
+
+def _init_whisper_worker(model_name: str, num_threads: int):
+    global _worker_whisper_model
+    torch.set_num_threads(num_threads)
+    _worker_whisper_model = whisper.load_model(model_name, device="cpu")
+
+
+def _transcribe_segments(batch) -> List[dict]:
+    # Items are (offset, samples) or, for long audio, (offset, (wav_path,
+    # start, end)) so each worker reads only its own regions from disk
+    segments = []
+    for offset, samples in batch:
+        if isinstance(samples, tuple):
+            samples = read_wav_range(*samples)
+        result = _worker_whisper_model.transcribe(samples, fp16=False)
+        segments.extend(
+            {
+                "start": round(offset + seg["start"], 2),
+                "end": round(offset + seg["end"], 2),
+                "text": seg["text"],
+            }
+            for seg in result.get("segments", [])
+        )
+    return segments
+
+
+def get_vad_pool(model_name: str):
+    """
+    Process pool of VAD_POOL_WORKERS workers, each holding one Whisper
+    model. One pool per model name, created once and never rebuilt, so
+    workers (and their loaded models) live for the whole process.
+    """
+    with _vad_pools_lock:
+        pool = _vad_pools.get(model_name)
+        if pool is None:
+            threads = max(1, (os.cpu_count() or VAD_POOL_WORKERS) // VAD_POOL_WORKERS)
+            pool = ProcessPoolExecutor(
+                max_workers=VAD_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_whisper_worker,
+                initargs=(model_name, threads),
+            )
+            _vad_pools[model_name] = pool
+        return pool
+
+
+def transcribe_audio_whisper_vad(
+    audio, model_name: str = "base", workers: Optional[int] = None
+) -> dict:
+    """
+    Drop silence, transcribe speech segments in parallel and stitch them
+    back into one transcript with absolute timestamps. `audio` is a
+    float32 array, or the path of a 16 kHz mono WAV (extract_audio_ffmpeg)
+    which is scanned in blocks and never loaded whole.
+    """
+    if isinstance(audio, str):
+        rms, n_samples = wav_frame_rms(audio)
+        regions = speech_regions_from_rms(rms, n_samples)
+    else:
+        n_samples = len(audio)
+        regions = detect_speech_regions(audio)
+
+    if not regions:
+        return {"text": "", "segments": [], "speech_seconds": 0.0,
+                "total_seconds": round(n_samples / WHISPER_SAMPLE_RATE, 2)}
+
+    workers = max(1, min(workers or VAD_POOL_WORKERS, VAD_POOL_WORKERS, len(regions)))
+    pool = get_vad_pool(model_name)
+
+    # Contiguous batches keep segment order and run on at most `workers` processes
+    if isinstance(audio, str):
+        jobs = [(s0 / WHISPER_SAMPLE_RATE, (audio, s0, s1)) for s0, s1 in regions]
+    else:
+        jobs = [(s0 / WHISPER_SAMPLE_RATE, audio[s0:s1]) for s0, s1 in regions]
+    per_batch = -(-len(jobs) // workers)
+    batches = [jobs[i:i + per_batch] for i in range(0, len(jobs), per_batch)]
+    segments = [seg for part in pool.map(_transcribe_segments, batches) for seg in part]
+
+    return {
+        "text": " ".join(seg["text"].strip() for seg in segments),
+        "segments": segments,
+        "speech_seconds": round(sum(s1 - s0 for s0, s1 in regions) / WHISPER_SAMPLE_RATE, 2),
+        "total_seconds": round(n_samples / WHISPER_SAMPLE_RATE, 2),
+    }
 
 
 def summarize_with_llm(llm, chat_history, content: str) -> str:
+    """
+    `chat_history` is the caller's ConversationMemory (or None).
+    """
     if llm is None:
         return "(LLM unavailable)"
 
@@ -120,9 +561,7 @@ def summarize_with_llm(llm, chat_history, content: str) -> str:
         template="Previous chat: {chat_history}\nSummarize:\n{content}"
     )
 
-    history_text = "\n".join(
-        [f"{m.type.capitalize()}: {m.content}" for m in chat_history.messages]
-    ) if chat_history else ""
+    history_text = chat_history.render() if chat_history else ""
 
     response = llm.invoke(prompt.format(chat_history=history_text, content=content))
 
@@ -133,6 +572,134 @@ def summarize_with_llm(llm, chat_history, content: str) -> str:
     return response
 
 
+# =====================================================
+# PIPELINE STAGES
+# =====================================================
+
+def run_audio_branch(
+    video_path,
+    tmpdir,
+    whisper_model_name,
+    device,
+    timings,
+    transcription="full",
+    transcribe_workers=None,
+) -> str:
+    start = time.perf_counter()
+    duration = probe_duration(video_path)
+    if duration is not None and duration <= IN_MEMORY_AUDIO_MAX_SECONDS:
+        audio = extract_audio_pcm(video_path, expected_seconds=duration)
+    else:
+        audio = extract_audio_ffmpeg(video_path, os.path.join(tmpdir, "audio.wav"))
+    timings["audio_extract"] = round(time.perf_counter() - start, 3)
+
+    if not whisper:
+        return ""
+
+    start = time.perf_counter()
+    if transcription == "vad":
+        text = transcribe_audio_whisper_vad(audio, whisper_model_name, transcribe_workers).get("text", "")
+    else:
+        wmodel = load_whisper_model(whisper_model_name, device)
+        text = transcribe_audio_whisper(wmodel, audio).get("text", "")
+    timings["transcribe"] = round(time.perf_counter() - start, 3)
+    return text
+
+
+def run_vision_branch(
+    video_path,
+    blip_model_name,
+    device,
+    sample_fps,
+    max_captions,
+    caption_batch_size,
+    frame_selection,
+    scene_threshold,
+    timings,
+):
+    """
+    Returns (scenes, frame_stats) where scenes are (start, end, caption).
+    """
+
+    scenes = []
+    frame_stats = {"sampled": 0, "keyframes": 0}
+    if not (cv2 and BlipProcessor and BlipForConditionalGeneration):
+        return scenes, frame_stats
+
+    start = time.perf_counter()
+    processor, model = load_blip_model(blip_model_name, device)
+
+    if frame_selection == "keyframes":
+        frames = islice(
+            select_keyframes(
+                iter_frames_opencv(video_path, sample_fps),
+                threshold=scene_threshold,
+                stats=frame_stats,
+            ),
+            max_captions,
+        )
+        scenes = [
+            (start_t, end_t, c)
+            for (start_t, end_t), c in caption_frames(processor, model, frames, device, caption_batch_size)
+        ]
+    else:
+        frames = iter_frames_opencv(video_path, sample_fps, max_frames=max_captions)
+        scenes = [
+            (t, t, c)
+            for t, c in caption_frames(processor, model, frames, device, caption_batch_size)
+        ]
+        frame_stats = {"sampled": len(scenes), "keyframes": len(scenes)}
+
+    timings["caption"] = round(time.perf_counter() - start, 3)
+    return scenes, frame_stats
+
+
+# =====================================================
+# BRANCH WORKERS (CONCURRENT MODE)
+# =====================================================
+
+# Cores for the audio branch's process; the vision branch gets the rest
+BRANCH_AUDIO_THREADS = int(os.environ.get(
+    "STUDYBUDDY_AUDIO_THREADS", str(max(1, (os.cpu_count() or 2) // 2))
+))
+
+_branch_pools = {}
+_branch_pools_lock = threading.Lock()
+
+
+def _init_branch_worker(num_threads: int):
+    torch.set_num_threads(num_threads)
+
+
+def _run_branch(branch, args, kwargs=None) -> tuple:
+    # Runs in a branch worker; timings come back with the result
+    timings = {}
+    return branch(*args, timings=timings, **(kwargs or {})), timings
+
+
+def get_branch_pool(name: str) -> ProcessPoolExecutor:
+    """
+    One single-process pool per branch ("audio"/"vision"), created once.
+    Each worker caps torch at its share of the cores, so Whisper and BLIP
+    can run at the same time without oversubscribing, and keeps its
+    models loaded between videos.
+    """
+    with _branch_pools_lock:
+        pool = _branch_pools.get(name)
+        if pool is None:
+            cpus = os.cpu_count() or 2
+            audio_threads = min(BRANCH_AUDIO_THREADS, max(1, cpus - 1))
+            threads = audio_threads if name == "audio" else max(1, cpus - audio_threads)
+            pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_branch_worker,
+                initargs=(threads,),
+            )
+            _branch_pools[name] = pool
+        return pool
+
+
 # =====================================================
 # PUBLIC API FUNCTION (FOR FLASK)
 # =====================================================
@@ -144,43 +711,116 @@ def analyze_video(
     sample_fps=0.5,
     max_captions=100,
     use_gpu=True,
+    caption_batch_size=8,
+    frame_selection="fixed",
+    scene_threshold=SCENE_CHANGE_THRESHOLD,
+    concurrent=True,
+    transcription="full",
+    transcribe_workers=None,
+    session_id=None,
+    summarize=True,
 ):
+    """
+    With summarize=False the result has no "summary" and depends only on
+    the video and parameters, so it can be cached and shared between
+    sessions; pass it to summarize_video() per request.
+    """
+    total_start = time.perf_counter()
+    timings = {}
     tmpdir = tempfile.mkdtemp()
-
-    audio_path = os.path.join(tmpdir, "audio.wav")
-    extract_audio_ffmpeg(video_path, audio_path)
-
-    transcript_text = ""
-    if whisper:
-        wmodel = whisper.load_model(whisper_model_name)
-        transcript_text = transcribe_audio_whisper(wmodel, audio_path).get("text", "")
-
     device = "cuda" if use_gpu and torch.cuda.is_available() else "cpu"
 
-    captions = []
-    if cv2 and BlipProcessor and BlipForConditionalGeneration:
-        frames = sample_frames_opencv(video_path, sample_fps)
-        processor = BlipProcessor.from_pretrained(blip_model_name)
-        model = BlipForConditionalGeneration.from_pretrained(blip_model_name).to(device)
-
-        for t, img in frames[:max_captions]:
-            captions.append((t, caption_image(processor, model, img, device)))
+    vision_args = (
+        video_path, blip_model_name, device, sample_fps, max_captions,
+        caption_batch_size, frame_selection, scene_threshold,
+    )
 
-    timeline = [f"{format_time(t)} — {c}" for t, c in captions]
+    try:
+        if concurrent:
+            # Whisper and BLIP are independent until aggregation. Each runs
+            # in its own worker process with its own torch thread budget
+            # (torch.set_num_threads is process-wide).
+            audio_future = get_branch_pool("audio").submit(
+                _run_branch, run_audio_branch, (video_path, tmpdir, whisper_model_name, device),
+                {"transcription": transcription, "transcribe_workers": transcribe_workers},
+            )
+            vision_future = get_branch_pool("vision").submit(_run_branch, run_vision_branch, vision_args)
+            transcript_text, audio_timings = audio_future.result()
+            (scenes, frame_stats), vision_timings = vision_future.result()
+            timings.update(audio_timings, **vision_timings)
+        else:
+            transcript_text = run_audio_branch(
+                video_path, tmpdir, whisper_model_name, device, timings,
+                transcription=transcription, transcribe_workers=transcribe_workers,
+            )
+            scenes, frame_stats = run_vision_branch(*vision_args, timings=timings)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    frame_stats["skipped"] = frame_stats["sampled"] - frame_stats["keyframes"]
+    captions = [(start, c) for start, _, c in scenes]
+    timeline = [f"{format_time_range(start, end)} — {c}" for start, end, c in scenes]
 
     aggregated = (
         "TRANSCRIPT:\n" + (transcript_text or "(no transcript)") +
         "\n\nCAPTIONS:\n" + "\n".join(timeline)
     )
 
-    summary = summarize_with_llm(llm, chat_history, aggregated)
-
-    shutil.rmtree(tmpdir, ignore_errors=True)
+    timings["total"] = round(time.perf_counter() - total_start, 3)
 
-    return {
+    result = {
         "transcript": transcript_text,
         "captions": captions,
         "timeline": timeline,
-        "summary": summary,
+        "frame_stats": frame_stats,
+        "timings": timings,
         "aggregated": aggregated,
     }
+    return summarize_video(result, session_id) if summarize else result
+
+
+# Summaries per (session, video), reused while that session's memory is
+# exactly as the summary left it
+VIDEO_SUMMARY_CACHE_SIZE = 256
+
+_summary_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_summary_cache_lock = threading.Lock()
+
+
+def summarize_video(result: dict, session_id=None) -> dict:
+    """
+    Copy of an analyze_video() result with the summary added, conditioned
+    on (and recorded in) `session_id`'s conversation memory. Re-uploading
+    a video with nothing said in between reuses the last summary instead
+    of calling the LLM again.
+    """
+    start = time.perf_counter()
+    chat_history = video_memory.get(session_id) if video_memory else None
+    content = result["aggregated"]
+    key = (session_id, hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest())
+
+    with _summary_cache_lock:
+        cached = _summary_cache.get(key)
+        if cached is not None:
+            _summary_cache.move_to_end(key)
+
+    unchanged = (
+        cached is not None
+        and chat_history is not None
+        and cached[0] is chat_history
+        and cached[1] == chat_history.version
+    )
+    if unchanged:
+        summary = cached[2]
+    else:
+        summary = summarize_with_llm(llm, chat_history, content)
+        if chat_history is not None:
+            with _summary_cache_lock:
+                _summary_cache[key] = (chat_history, chat_history.version, summary)
+                while len(_summary_cache) > VIDEO_SUMMARY_CACHE_SIZE:
+                    _summary_cache.popitem(last=False)
+    elapsed = round(time.perf_counter() - start, 3)
+
+    timings = dict(result["timings"], summarize=elapsed)
+    timings["total"] = round(timings["total"] + elapsed, 3)
+    return dict(result, timings=timings, summary=summary)
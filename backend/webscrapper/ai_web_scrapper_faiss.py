@@ -1,31 +1,49 @@
 import requests
 from bs4 import BeautifulSoup
-import faiss
-import numpy as np
 
-from langchain_ollama import OllamaLLM
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_text_splitters import CharacterTextSplitter
 
+from common.embedding_cache import chunk_hash
+from common.context_packing import find_offsets
+from common.embedding_service import get_embeddings
+from common.llm_gateway import get_llm
+from common.rag import RAGAnswerer, add_chunks
+from common.vector_index import VectorIndex
+
 # ======================
 # Model & Embeddings (UNCHANGED)
 # ======================
 
-llm = OllamaLLM(model="mistral")
+LLM_MODEL_NAME = "mistral"
 
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+llm = get_llm(LLM_MODEL_NAME)
+
+# Shared Hugging Face embeddings (loaded on first use)
+embeddings = get_embeddings("sentence-transformers/all-MiniLM-L6-v2")
 
 # ======================
 # FAISS Vector Index (UNCHANGED)
 # ======================
 
 embedding_dim = 384
-index = faiss.IndexFlatL2(embedding_dim)
 
-# Maps FAISS row index -> {"url": ..., "text": ...}
-vector_store = []
+# FAISS row index -> {"url": ..., "text": ...}, persisted on disk
+vector_store = VectorIndex("web", embedding_dim)
+
+rag = RAGAnswerer(
+    vector_store, embeddings, llm, LLM_MODEL_NAME,
+    prompt=(
+        "You are a helpful assistant. Use ONLY the context below to answer the question.\n"
+        "If the answer is not in the context, say you don't know.\n\n"
+        "Context:\n{context}\n\n"
+        "Question: {query}\n"
+        "Answer:"
+    ),
+    source_field="url",
+    k=5,
+    empty_message="No data stored yet. Please scrape a website first.",
+    no_hits_message="No relevant data found.",
+)
 
 # ======================
 # Utils: Scraping (LOGIC UNCHANGED)
@@ -60,73 +78,31 @@ def scrape_website(url: str) -> str:
 # ======================
 
 def store_in_faiss(text: str, url: str) -> str:
-    global index, vector_store
-
     splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=100)
     chunks = splitter.split_text(text)
 
     if not chunks:
         return "Nothing to store (no chunks created)."
 
-    chunk_vectors = embeddings.embed_documents(chunks)
-    vectors = np.array(chunk_vectors, dtype=np.float32)
-
-    if vectors.shape[1] != embedding_dim:
-        return f"Embedding dimension mismatch: expected {embedding_dim}, got {vectors.shape[1]}"
-
-    index.add(vectors)
-
-    for chunk in chunks:
-        vector_store.append({
-            "url": url,
-            "text": chunk
-        })
-
-    return f"Stored {len(chunks)} chunks from {url} in FAISS."
-
-
-# ======================
-# Retrieval + QA (LOGIC UNCHANGED)
-# ======================
-
-def retrieve_and_answer(query: str) -> str:
-    global index, vector_store
-
-    if index.ntotal == 0 or len(vector_store) == 0:
-        return "No data stored yet. Please scrape a website first."
-
-    query_vector = np.array(
-        embeddings.embed_query(query),
-        dtype=np.float32
-    ).reshape(1, -1)
-
-    if query_vector.shape[1] != embedding_dim:
-        return "Query embedding dimension mismatch."
-
-    k = min(5, index.ntotal)
-    distances, indices = index.search(query_vector, k=k)
-
-    context_chunks = []
-    for idx in indices[0]:
-        if 0 <= idx < len(vector_store):
-            context_chunks.append(vector_store[idx]["text"])
-
-    if not context_chunks:
-        return "No relevant data found."
+    try:
+        # One id per scraped version of the page, so chunks of an edited
+        # page are never stitched together with the old text by offset
+        added, duplicates, cache_hits = add_chunks(
+            vector_store, embeddings, chunks, {"url": url},
+            doc_id=f"{url}#{chunk_hash(text)}", offsets=find_offsets(text, chunks),
+        )
+    except ValueError as e:
+        return str(e)
 
-    context = "\n\n".join(context_chunks)
+    if not added:
+        return f"All {len(chunks)} chunks from {url} are already stored."
+    vector_store.snapshot()
 
-    prompt = (
-        "You are a helpful assistant. Use ONLY the context below to answer the question.\n"
-        "If the answer is not in the context, say you don't know.\n\n"
-        f"Context:\n{context}\n\n"
-        f"Question: {query}\n"
-        "Answer:"
+    return (
+        f"Stored {added} chunks from {url} in FAISS "
+        f"({duplicates} duplicates skipped, {cache_hits} embeddings reused from cache)."
     )
 
-    answer = llm.invoke(prompt)
-    return answer if isinstance(answer, str) else str(answer)
-
 
 # ======================
 # PUBLIC API FUNCTIONS (FOR FLASK)
@@ -157,4 +133,11 @@ def ask_web_question(question: str) -> str:
     """
     Call this for Q&A
     """
-    return retrieve_and_answer(question)
+    return rag.answer(question)
+
+
+def ask_web_question_stream(question: str):
+    """
+    Call this for streamed (SSE) Q&A
+    """
+    return rag.stream(question)